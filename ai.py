@@ -0,0 +1,260 @@
+import random
+from time import perf_counter
+from engine import PathOracle, legal_walls
+
+WIN = 100000
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+_zobrist = {}
+
+
+class _Timeout(Exception):
+    pass
+
+
+def zobrist_tables(size):
+    tables = _zobrist.get(size)
+    if tables is None:
+        rnd = random.Random(size)
+        cells = size * size
+        tables = _zobrist[size] = (
+            [[rnd.getrandbits(64) for _ in range(cells)] for _ in range(2)],
+            [rnd.getrandbits(64) for _ in range(cells)],
+            [rnd.getrandbits(64) for _ in range(cells)],
+            [[], []],
+            rnd.getrandbits(64),
+        )
+    return tables
+
+
+def _count_key(counts, player, count):
+    keys = counts[player]
+    while len(keys) <= count:
+        keys.append(random.getrandbits(64))
+    return keys[count]
+
+
+def zobrist_key(state):
+    pawns, hkeys, vkeys, counts, turn_key = zobrist_tables(state.size)
+    key = pawns[0][state.pawns[0]] ^ pawns[1][state.pawns[1]]
+    for mask, keys in ((state.hwalls, hkeys), (state.vwalls, vkeys)):
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            key ^= keys[low.bit_length() - 1]
+    key ^= _count_key(counts, 0, state.walls[0]) ^ _count_key(counts, 1, state.walls[1])
+    if state.turn:
+        key ^= turn_key
+    return key
+
+
+def scored_moves(state, oracle):
+    # (gain, move) pairs: pawn moves by how much they shorten the mover's
+    # path, walls by how much more they cost the opponent than the mover.
+    # Walls that gain nothing are pruned on purpose, not just ordered last:
+    # neither alpha-beta nor MCTS ever searches them. Keeping them would
+    # multiply the branching factor for moves that rarely matter.
+    me = state.turn
+    own, other = oracle.dist[me], oracle.dist[1 - me]
+    here, there = state.pawns[me], state.pawns[1 - me]
+    mine, theirs = own[here], other[there]
+
+    scored = [(mine - own[target], ("move", target)) for target in state.pawn_moves()]
+    for row, col, orientation in legal_walls(state, oracle):
+        token = oracle.add_wall(row, col, orientation)
+        delta = (other[there] - theirs) - (own[here] - mine)
+        oracle.undo(token)
+        if delta > 0:
+            scored.append((delta, ("wall", row, col, orientation)))
+    return scored
+
+
+class TranspositionTable:
+    # Fixed number of slots indexed by the low bits of the key. A slot is
+    # overwritten by a deeper search or by anything from a newer search.
+    __slots__ = ("mask", "keys", "entries", "generation")
+
+    def __init__(self, bits=16):
+        self.mask = (1 << bits) - 1
+        self.keys = [0] * (1 << bits)
+        self.entries = [None] * (1 << bits)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, key):
+        slot = key & self.mask
+        if self.keys[slot] == key:
+            return self.entries[slot]
+        return None
+
+    def put(self, key, depth, flag, value, move):
+        slot = key & self.mask
+        entry = self.entries[slot]
+        if entry is None or self.keys[slot] == key or entry[4] != self.generation or depth >= entry[0]:
+            self.keys[slot] = key
+            self.entries[slot] = (depth, flag, value, move, self.generation)
+
+
+class AlphaBetaPlayer:
+    def __init__(self, time_budget=1.0, max_depth=32, table_bits=16):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_bits)
+        self.nodes = 0
+
+    def choose(self, state):
+        self.state = state.copy()
+        self.oracle = PathOracle(self.state)
+        self.key = zobrist_key(self.state)
+        self.tables = zobrist_tables(state.size)
+        self.deadline = perf_counter() + self.time_budget
+        self.nodes = 0
+        self.table.new_search()
+
+        moves = self._ordered_moves(None)
+        if not moves:
+            return None
+        best_move = moves[0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self._root(depth, moves, best_move)
+            except _Timeout:
+                break
+            best_move = move
+            if abs(score) >= WIN - self.max_depth:
+                break
+        return best_move
+
+    def _root(self, depth, moves, first):
+        moves = [first] + [move for move in moves if move != first]
+        alpha, best_move = -WIN - 1, first
+        for move in moves:
+            undo = self._make(move)
+            score = -self._search(depth - 1, -WIN - 1, -alpha, 1)
+            self._unmake(move, undo)
+            if score > alpha:
+                alpha, best_move = score, move
+        return alpha, best_move
+
+    def _search(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 15 == 0 and perf_counter() > self.deadline:
+            raise _Timeout
+        if self.state.winner() is not None:
+            return -(WIN - ply)
+        if depth == 0:
+            return self._evaluate()
+
+        alpha_start = alpha
+        entry = self.table.get(self.key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[3]
+            if entry[0] >= depth:
+                flag, value = entry[1], entry[2]
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value >= beta:
+                    return value
+                if flag == UPPER and value <= alpha:
+                    return value
+
+        best, best_move = -WIN - 1, None
+        for move in self._ordered_moves(tt_move):
+            undo = self._make(move)
+            score = -self._search(depth - 1, -beta, -alpha, ply + 1)
+            self._unmake(move, undo)
+            if score > best:
+                best, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best <= alpha_start:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.put(self.key, depth, flag, best, best_move)
+        return best
+
+    def _evaluate(self):
+        state, dist = self.state, self.oracle.dist
+        me = state.turn
+        mine = dist[me][state.pawns[me]]
+        theirs = dist[1 - me][state.pawns[1 - me]]
+        return (theirs - mine) * 10 + (state.walls[me] - state.walls[1 - me]) * 3
+
+    def _ordered_moves(self, tt_move):
+        scored = scored_moves(self.state, self.oracle)
+        scored.sort(key=lambda item: -item[0])
+        moves = [move for _, move in scored]
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def _make(self, move):
+        state = self.state
+        pawns, hkeys, vkeys, counts, turn_key = self.tables
+        me = state.turn
+        if move[0] == "move":
+            self.key ^= pawns[me][state.pawns[me]] ^ pawns[me][move[1]] ^ turn_key
+            return state.make_move(move[1])
+        _, row, col, orientation = move
+        bits = state.wall_bits(row, col, orientation)
+        keys = hkeys if orientation == "h" else vkeys
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            self.key ^= keys[low.bit_length() - 1]
+        count = state.walls[me]
+        self.key ^= _count_key(counts, me, count) ^ _count_key(counts, me, count - 1) ^ turn_key
+        state.make_wall(row, col, orientation)
+        return self.oracle.add_wall(row, col, orientation)
+
+    def _unmake(self, move, undo):
+        state = self.state
+        pawns, hkeys, vkeys, counts, turn_key = self.tables
+        if move[0] == "move":
+            state.unmake_move(undo)
+            me = state.turn
+            self.key ^= pawns[me][state.pawns[me]] ^ pawns[me][move[1]] ^ turn_key
+            return
+        _, row, col, orientation = move
+        self.oracle.undo(undo)
+        state.unmake_wall(row, col, orientation)
+        me = state.turn
+        bits = state.wall_bits(row, col, orientation)
+        keys = hkeys if orientation == "h" else vkeys
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            self.key ^= keys[low.bit_length() - 1]
+        count = state.walls[me]
+        self.key ^= _count_key(counts, me, count) ^ _count_key(counts, me, count - 1) ^ turn_key
+
+
+class RandomPlayer:
+    def __init__(self, wall_rate=0.1, seed=None):
+        self.wall_rate = wall_rate
+        self.random = random.Random(seed)
+
+    def choose(self, state):
+        if state.walls[state.turn] > 0 and self.random.random() < self.wall_rate:
+            walls = legal_walls(state)
+            if walls:
+                return ("wall",) + self.random.choice(walls)
+        targets = state.pawn_moves()
+        if targets:
+            return ("move", self.random.choice(targets))
+        walls = legal_walls(state)
+        if walls:
+            return ("wall",) + self.random.choice(walls)
+        return None
@@ -0,0 +1,98 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+import secrets
+import asyncio
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+
+BCRYPT_ROUNDS = int(os.environ.get("WALLWIZARD_BCRYPT_ROUNDS", "12"))
+SESSION_TTL = 15 * 60
+
+
+def hash_cost(hashed):
+    # "$2b$12$..." -> 12
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class SessionManager:
+    # Tokens look like "<username>.<expiry>.<nonce>.<mac>", the username
+    # urlsafe-base64 encoded and the mac an HMAC-SHA256 of everything before
+    # it. Checking one is a single HMAC, no bcrypt. The secret is random per
+    # process unless WALLWIZARD_SESSION_SECRET is set. Revoked nonces are
+    # kept only until the token would have expired anyway.
+    def __init__(self, secret=None, ttl=SESSION_TTL):
+        secret = secret or os.environ.get("WALLWIZARD_SESSION_SECRET")
+        self.secret = secret.encode('utf-8') if secret else os.urandom(32)
+        self.ttl = ttl
+        self.revoked = {}
+
+    def _sign(self, body):
+        return hmac.new(self.secret, body.encode('ascii'), hashlib.sha256).hexdigest()
+
+    def issue(self, username, now=None):
+        expires = int((time.time() if now is None else now) + self.ttl)
+        name = base64.urlsafe_b64encode(username.encode('utf-8')).decode('ascii')
+        body = f"{name}.{expires}.{secrets.token_hex(8)}"
+        return f"{body}.{self._sign(body)}"
+
+    def validate(self, token, now=None):
+        # None for anything that is not a live token, however malformed
+        parts = token.split(".") if token.isascii() else ()
+        if len(parts) != 4 or not parts[1].isdigit():
+            return None
+        name, expires, nonce, mac = parts
+        if not hmac.compare_digest(mac, self._sign(f"{name}.{expires}.{nonce}")):
+            return None
+        if int(expires) <= (time.time() if now is None else now) or nonce in self.revoked:
+            return None
+        return base64.urlsafe_b64decode(name).decode('utf-8')
+
+    def revoke(self, token, now=None):
+        parts = token.split(".")
+        if len(parts) == 4 and parts[1].isascii() and parts[1].isdigit():
+            self.revoked[parts[2]] = int(parts[1])
+        now = time.time() if now is None else now
+        for nonce, expires in list(self.revoked.items()):
+            if expires <= now:
+                del self.revoked[nonce]
+
+
+class AuthService:
+    # bcrypt on a small thread pool. bcrypt releases the GIL while it works,
+    # so the terminal stays responsive and two checks can run side by side.
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=2, session_ttl=SESSION_TTL):
+        self.rounds = rounds
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt")
+        self.sessions = SessionManager(ttl=session_ttl)
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    def _verify(self, password, hashed):
+        # (ok, new_hash); new_hash is set when the stored hash used another cost
+        if not bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8')):
+            return False, None
+        if hash_cost(hashed) != self.rounds:
+            return True, self._hash(password)
+        return True, None
+
+    def hash_password(self, password):
+        return self.pool.submit(self._hash, password)
+
+    def verify_password(self, password, hashed):
+        return self.pool.submit(self._verify, password, hashed)
+
+    async def hash_password_async(self, password):
+        return await asyncio.wrap_future(self.hash_password(password))
+
+    async def verify_password_async(self, password, hashed):
+        return await asyncio.wrap_future(self.verify_password(password, hashed))
+
+    def close(self):
+        self.pool.shutdown()
@@ -0,0 +1,167 @@
+import numpy as np
+from engine import (GameState, SIZE, WALLS, BLOCKED, NO_MOVE, NEED_DIAGONAL, DIAGONAL_BLOCKED, WALL_OK,
+                    WALL_INVALID, WALL_OVERLAP, NO_WALLS_LEFT)
+from rules import WALL_BLOCKS_PATH
+
+# direction codes index engine.DIRECTIONS, diagonal codes ("left", "right")
+UP, DOWN, LEFT, RIGHT = range(4)
+NO_DIAGONAL = -1
+DIAGONAL_LEFT, DIAGONAL_RIGHT = range(2)
+
+
+class BatchGames:
+    # N independent games as arrays: pawns[n, player] is a cell index,
+    # hwalls[n, row] and vwalls[n, row] hold GameState's wall bits for one
+    # row (bit col), walls[n, player] the walls left and turn[n] the mover.
+    # apply_moves and apply_walls play one move in every game at once and
+    # answer with the codes rules.apply_move / apply_wall would give.
+    def __init__(self, count, size=SIZE, walls=WALLS):
+        if not 2 <= size <= 32:
+            raise ValueError(f"batch boards hold one uint32 per wall row, size {size} is not supported")
+        self.count = count
+        self.size = size
+        self.index = np.arange(count)
+        self.pawns = np.tile(np.array([size // 2, (size - 1) * size + size // 2], dtype=np.int64), (count, 1))
+        self.hwalls = np.zeros((count, size), dtype=np.uint32)
+        self.vwalls = np.zeros((count, size), dtype=np.uint32)
+        self.walls = np.full((count, 2), walls, dtype=np.int64)
+        self.turn = np.zeros(count, dtype=np.int64)
+
+    @classmethod
+    def from_states(cls, states):
+        size = states[0].size
+        batch = cls(len(states), size)
+        full = (1 << size) - 1
+        for n, state in enumerate(states):
+            batch.pawns[n] = state.pawns
+            batch.walls[n] = state.walls
+            batch.turn[n] = state.turn
+            for row in range(size):
+                batch.hwalls[n, row] = state.hwalls >> row * size & full
+                batch.vwalls[n, row] = state.vwalls >> row * size & full
+        return batch
+
+    def state(self, n):
+        size = self.size
+        state = GameState(size)
+        state.pawns = [int(cell) for cell in self.pawns[n]]
+        state.walls = [int(count) for count in self.walls[n]]
+        state.turn = int(self.turn[n])
+        state.hwalls = sum(int(bits) << row * size for row, bits in enumerate(self.hwalls[n]))
+        state.vwalls = sum(int(bits) << row * size for row, bits in enumerate(self.vwalls[n]))
+        return state
+
+    def winners(self):
+        # -1 while a game is still on, like GameState.winner() returning None
+        size = self.size
+        won = np.full(self.count, -1, dtype=np.int64)
+        won[self.pawns[:, 1] // size == 0] = 1
+        won[self.pawns[:, 0] // size == size - 1] = 0
+        return won
+
+    def _bit(self, planes, cells):
+        # wall bit at each game's cell; cells off the board read as anything,
+        # so callers guard them the way move_target does
+        cells = np.clip(cells, 0, self.size * self.size - 1)
+        return (planes[self.index, cells // self.size] >> (cells % self.size).astype(np.uint32) & 1).astype(bool)
+
+    def apply_moves(self, directions, diagonals=None, active=None):
+        # move_target for every game; games outside `active` report NO_MOVE
+        size = self.size
+        d = np.asarray(directions)
+        g = np.full(self.count, NO_DIAGONAL) if diagonals is None else np.asarray(diagonals)
+        h, v = self.hwalls, self.vwalls
+        me = self.pawns[self.index, self.turn]
+        other = self.pawns[self.index, 1 - self.turn]
+        row, col = me // size, me % size
+        up, down, left, right = d == UP, d == DOWN, d == LEFT, d == RIGHT
+
+        free = ((up & (row > 0) & ~self._bit(h, me - size)) | (down & (row < size - 1) & ~self._bit(h, me))
+                | (left & (col > 0) & ~self._bit(v, me - 1)) | (right & (col < size - 1) & ~self._bit(v, me)))
+        step = np.select([up, down, left, right], [-size, size, -1, 1], 0)
+        target = me + step
+        result = np.where(free, target, BLOCKED)
+
+        # jumping over the other pawn, straight on or else diagonally
+        trow, tcol = target // size, target % size
+        straight = ((up & (trow >= 1) & ~self._bit(h, target - size))
+                    | (down & (trow <= size - 2) & ~self._bit(h, target)))
+        to_right = (tcol < size - 1) & (~self._bit(v, target) | ~self._bit(h, np.where(up, target + 1,
+                                                                                         target - size + 1)))
+        to_left = (tcol > 0) & (~self._bit(v, target - 1) | ~self._bit(h, np.where(up, target - 1,
+                                                                                    target - size - 1)))
+        diagonal = np.select([g == NO_DIAGONAL, g == DIAGONAL_RIGHT, g == DIAGONAL_LEFT],
+                             [NEED_DIAGONAL, np.where(to_right, target + 1, DIAGONAL_BLOCKED),
+                              np.where(to_left, target - 1, DIAGONAL_BLOCKED)], NO_MOVE)
+        jumped = np.where(up | down, np.where(straight, target + step, diagonal), NO_MOVE)
+        result = np.where(free & (target == other), jumped, result)
+        if active is not None:
+            result = np.where(active, result, NO_MOVE)
+
+        moved = np.flatnonzero(result >= 0)
+        self.pawns[moved, self.turn[moved]] = result[moved]
+        self.turn[moved] ^= 1
+        return result
+
+    def apply_walls(self, rows, cols, vertical, active=None):
+        # wall_status plus the path check for every game; games outside
+        # `active` report WALL_INVALID
+        size = self.size
+        rows, cols, vertical = np.asarray(rows), np.asarray(cols), np.asarray(vertical, dtype=bool)
+        h, v = self.hwalls, self.vwalls
+        in_range = (rows >= 0) & (rows <= size - 2) & (cols >= 0) & (cols <= size - 2)
+        r = np.clip(rows, 0, size - 2)
+        c = np.clip(cols, 0, size - 2).astype(np.uint32)
+        below, above = v[self.index, r] >> c & 1, v[self.index, r + 1] >> c & 1
+        pair = h[self.index, r] >> c & 3
+        taken = np.where(vertical, (below | above) != 0, pair != 0)
+        crossed = np.where(vertical, (c < size - 2) & (pair == 3), (r < size - 2) & ((below & above) != 0))
+        status = np.select([self.walls[self.index, self.turn] <= 0, ~in_range, taken, crossed],
+                           [NO_WALLS_LEFT, WALL_INVALID, WALL_INVALID, WALL_OVERLAP], WALL_OK)
+        if active is not None:
+            status = np.where(active, status, WALL_INVALID)
+
+        todo = np.flatnonzero(status == WALL_OK)
+        if not len(todo):
+            return status
+        hwalls, vwalls = h[todo], v[todo]
+        k, r, c, vert = np.arange(len(todo)), r[todo], c[todo], vertical[todo]
+        hwalls[k[~vert], r[~vert]] |= np.uint32(3) << c[~vert]
+        vwalls[k[vert], r[vert]] |= np.uint32(1) << c[vert]
+        vwalls[k[vert], r[vert] + 1] |= np.uint32(1) << c[vert]
+
+        pawns = self.pawns[todo]
+        goals = np.concatenate([np.full(len(todo), size - 1), np.zeros(len(todo), dtype=np.int64)])
+        reached = self._reachable(np.concatenate([hwalls, hwalls]), np.concatenate([vwalls, vwalls]),
+                                  np.concatenate([pawns[:, 0], pawns[:, 1]]), goals)
+        ok = reached[:len(todo)] & reached[len(todo):]
+        status[todo[~ok]] = WALL_BLOCKS_PATH
+
+        placed = todo[ok]
+        self.hwalls[placed] = hwalls[ok]
+        self.vwalls[placed] = vwalls[ok]
+        self.walls[placed, self.turn[placed]] -= 1
+        self.turn[placed] ^= 1
+        return status
+
+    def _reachable(self, hwalls, vwalls, starts, goals):
+        # Batched flood fill on row bitmasks: every pass spreads each game's
+        # reached cells one step in all four directions. Games drop out once
+        # they touch their goal row or stop growing.
+        size = self.size
+        full = np.uint32((1 << size) - 1)
+        found = np.zeros(len(starts), dtype=bool)
+        live = np.arange(len(starts))
+        reach = np.zeros((len(starts), size), dtype=np.uint32)
+        reach[live, starts // size] = np.uint32(1) << (starts % size).astype(np.uint32)
+        down = ~hwalls[:, :-1]
+        across = ~vwalls
+        while len(live):
+            grow = reach | ((reach & across) << np.uint32(1)) & full | (reach >> np.uint32(1)) & across
+            grow[:, 1:] |= reach[:, :-1] & down
+            grow[:, :-1] |= reach[:, 1:] & down
+            done = grow[np.arange(len(live)), goals] != 0
+            found[live[done]] = True
+            keep = ~done & (grow != reach).any(axis=1)
+            live, reach, down, across, goals = live[keep], grow[keep], down[keep], across[keep], goals[keep]
+        return found
@@ -4,6 +4,7 @@ import bcrypt
 import uuid
 import random
 from rich.console import Console
+from storage import load_json, save_json
 from rich.table import Table
 from rich.panel import Panel
 
@@ -13,19 +14,6 @@ USERS_FILE = "users.json"
 GAMES_FILE = "games.json"
 LEADERBOARD_FILE = "leaderboard.json"
 
-def load_json(file_path, default_value):
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, 'r') as file:
-                return json.load(file)
-        except (json.JSONDecodeError, ValueError):
-            return default_value
-    return default_value
-
-def save_json(file_path, data):
-    with open(file_path, 'w') as file:
-        json.dump(data, file, indent=4)
-
 def initialize_files():
     for file_path, default_value in [(USERS_FILE, {}), (GAMES_FILE, []), (LEADERBOARD_FILE, {})]:
         if not os.path.exists(file_path):
@@ -0,0 +1,662 @@
+import sys
+import random
+import struct
+import threading
+from array import array
+from heapq import heappush, heappop
+
+SIZE = 9
+WALLS = 10
+PLAYERS = ("P1", "P2")
+
+# move_target results that are not a destination cell
+BLOCKED = -1
+NO_MOVE = -2
+NEED_DIAGONAL = -3
+DIAGONAL_BLOCKED = -4
+
+DIRECTIONS = ("up", "down", "left", "right")
+
+INF = 1 << 30
+
+# packed save: magic, version, size, turn, two pawn cells, two wall counts,
+# then the horizontal and vertical wall masks, little-endian
+SAVE_MAGIC = b"WW"
+SAVE_VERSION = 1
+_save_header = struct.Struct("<2sBBBHHBB")
+
+_anchors = {}
+_labels = random.Random()
+_buffers = threading.local()
+
+# wall_status results
+WALL_OK = 0
+WALL_INVALID = 1
+WALL_OVERLAP = 2
+NO_WALLS_LEFT = 3
+
+
+class GameState:
+    # hwalls bit i: wall under cell i (the old walls_h entry (row, col))
+    # vwalls bit i: wall right of cell i (the old walls_v entry (row, col))
+    __slots__ = ("size", "hwalls", "vwalls", "pawns", "walls", "turn")
+
+    def __init__(self, size=SIZE, walls=WALLS):
+        self.size = size
+        self.hwalls = 0
+        self.vwalls = 0
+        self.pawns = [size // 2, (size - 1) * size + size // 2]
+        self.walls = [walls, walls]
+        self.turn = 0
+
+    @classmethod
+    def from_saved(cls, board, walls, walls_h, walls_v, current_player):
+        size = len(board)
+        state = cls(size)
+        for row in range(size):
+            for col in range(size):
+                if board[row][col] in PLAYERS:
+                    state.pawns[PLAYERS.index(board[row][col])] = row * size + col
+        for row, col in walls_h:
+            state.hwalls |= 1 << (row * size + col)
+        for row, col in walls_v:
+            state.vwalls |= 1 << (row * size + col)
+        state.walls = [walls["P1"], walls["P2"]]
+        state.turn = PLAYERS.index(current_player)
+        return state
+
+    @classmethod
+    def unpack(cls, data):
+        view = memoryview(data)
+        if len(view) < _save_header.size:
+            raise ValueError("truncated save")
+        magic, version, size, turn, pawn1, pawn2, walls1, walls2 = _save_header.unpack_from(view)
+        if magic != SAVE_MAGIC or version != SAVE_VERSION:
+            raise ValueError("unsupported save format")
+        width = (size * size + 7) // 8
+        start = _save_header.size
+        if len(view) != start + 2 * width:
+            raise ValueError("truncated save")
+        if size < 2:
+            raise ValueError(f"bad board size in save: {size}")
+        if turn not in (0, 1):
+            raise ValueError(f"bad turn in save: {turn}")
+        if pawn1 >= size * size or pawn2 >= size * size:
+            raise ValueError("pawn off the board in save")
+        state = cls(size)
+        state.pawns = [pawn1, pawn2]
+        state.walls = [walls1, walls2]
+        state.turn = turn
+        state.hwalls = int.from_bytes(view[start:start + width], "little")
+        state.vwalls = int.from_bytes(view[start + width:], "little")
+        return state
+
+    def pack(self):
+        width = (self.size * self.size + 7) // 8
+        return (_save_header.pack(SAVE_MAGIC, SAVE_VERSION, self.size, self.turn, self.pawns[0], self.pawns[1],
+                                  self.walls[0], self.walls[1])
+                + self.hwalls.to_bytes(width, "little") + self.vwalls.to_bytes(width, "little"))
+
+    def copy(self):
+        state = GameState.__new__(GameState)
+        state.size = self.size
+        state.hwalls = self.hwalls
+        state.vwalls = self.vwalls
+        state.pawns = self.pawns[:]
+        state.walls = self.walls[:]
+        state.turn = self.turn
+        return state
+
+    @property
+    def current_player(self):
+        return PLAYERS[self.turn]
+
+    def position(self, player):
+        return divmod(self.pawns[player], self.size)
+
+    def to_board(self):
+        size = self.size
+        board = [["." for _ in range(size)] for _ in range(size)]
+        for player, cell in enumerate(self.pawns):
+            row, col = divmod(cell, size)
+            board[row][col] = PLAYERS[player]
+        return board
+
+    def h_segments(self):
+        return _segments(self.hwalls, self.size)
+
+    def v_segments(self):
+        return _segments(self.vwalls, self.size)
+
+    def wall_counts(self):
+        return {"P1": self.walls[0], "P2": self.walls[1]}
+
+    def move_target(self, direction, diagonal=None):
+        size = self.size
+        cell = self.pawns[self.turn]
+        row, col = divmod(cell, size)
+        h, v = self.hwalls, self.vwalls
+        if direction == "up" and row > 0 and not h >> (cell - size) & 1:
+            target = cell - size
+        elif direction == "down" and row < size - 1 and not h >> cell & 1:
+            target = cell + size
+        elif direction == "left" and col > 0 and not v >> (cell - 1) & 1:
+            target = cell - 1
+        elif direction == "right" and col < size - 1 and not v >> cell & 1:
+            target = cell + 1
+        else:
+            return BLOCKED
+        if target != self.pawns[1 - self.turn]:
+            return target
+
+        new_row, new_col = divmod(target, size)
+        if direction == "up":
+            if new_row >= 1 and not h >> (target - size) & 1:
+                return target - size
+            if diagonal is None:
+                return NEED_DIAGONAL
+            if diagonal == "right":
+                if new_col < size - 1 and (not v >> target & 1 or not h >> (target + 1) & 1):
+                    return target + 1
+                return DIAGONAL_BLOCKED
+            if diagonal == "left":
+                if new_col > 0 and (not v >> (target - 1) & 1 or not h >> (target - 1) & 1):
+                    return target - 1
+                return DIAGONAL_BLOCKED
+        elif direction == "down":
+            if new_row <= size - 2 and not h >> target & 1:
+                return target + size
+            if diagonal is None:
+                return NEED_DIAGONAL
+            if diagonal == "right":
+                if new_col < size - 1 and (not v >> target & 1 or not h >> (target - size + 1) & 1):
+                    return target + 1
+                return DIAGONAL_BLOCKED
+            if diagonal == "left":
+                if new_col > 0 and (not h >> (target - size - 1) & 1 or not v >> (target - 1) & 1):
+                    return target - 1
+                return DIAGONAL_BLOCKED
+        return NO_MOVE
+
+    def pawn_moves(self):
+        targets = []
+        for direction in DIRECTIONS:
+            target = self.move_target(direction)
+            if target == NEED_DIAGONAL:
+                for diagonal in ("left", "right"):
+                    target = self.move_target(direction, diagonal)
+                    if target >= 0 and target not in targets:
+                        targets.append(target)
+            elif target >= 0 and target not in targets:
+                targets.append(target)
+        return targets
+
+    def make_move(self, target):
+        previous = self.pawns[self.turn]
+        self.pawns[self.turn] = target
+        self.turn ^= 1
+        return previous
+
+    def unmake_move(self, previous):
+        self.turn ^= 1
+        self.pawns[self.turn] = previous
+
+    def wall_bits(self, row, col, orientation):
+        size = self.size
+        i = row * size + col
+        if orientation == "h":
+            return 0b11 << i
+        return (1 | 1 << size) << i
+
+    def wall_status(self, row, col, orientation):
+        if self.walls[self.turn] <= 0:
+            return NO_WALLS_LEFT
+        size = self.size
+        if not (0 <= row <= size - 2 and 0 <= col <= size - 2):
+            return WALL_INVALID
+        bits = self.wall_bits(row, col, orientation)
+        i = row * size + col
+        if orientation == "h":
+            if self.hwalls & bits:
+                return WALL_INVALID
+            if row < size - 2 and self.vwalls >> i & 1 and self.vwalls >> (i + size) & 1:
+                return WALL_OVERLAP
+        else:
+            if self.vwalls & bits:
+                return WALL_INVALID
+            if col < size - 2 and self.hwalls >> i & 1 and self.hwalls >> (i + 1) & 1:
+                return WALL_OVERLAP
+        return WALL_OK
+
+    def blocks_path(self, row, col, orientation):
+        bits = self.wall_bits(row, col, orientation)
+        if orientation == "h":
+            self.hwalls |= bits
+        else:
+            self.vwalls |= bits
+        blocked = not self.has_path(0) or not self.has_path(1)
+        if orientation == "h":
+            self.hwalls ^= bits
+        else:
+            self.vwalls ^= bits
+        return blocked
+
+    def make_wall(self, row, col, orientation):
+        if orientation == "h":
+            self.hwalls |= self.wall_bits(row, col, orientation)
+        else:
+            self.vwalls |= self.wall_bits(row, col, orientation)
+        self.walls[self.turn] -= 1
+        self.turn ^= 1
+
+    def unmake_wall(self, row, col, orientation):
+        self.turn ^= 1
+        self.walls[self.turn] += 1
+        if orientation == "h":
+            self.hwalls ^= self.wall_bits(row, col, orientation)
+        else:
+            self.vwalls ^= self.wall_bits(row, col, orientation)
+
+    def has_path(self, player):
+        return self.distance(player) >= 0
+
+    def distance(self, player):
+        goal_row = self.size - 1 if player == 0 else 0
+        return shortest_distance(self.hwalls, self.vwalls, self.pawns[player], goal_row, self.size)
+
+    def winner(self):
+        size = self.size
+        if self.pawns[0] // size == size - 1:
+            return 0
+        if self.pawns[1] // size == 0:
+            return 1
+        return None
+
+
+def pack_plies(plies):
+    plies = array("I", plies)
+    if sys.byteorder == "big":
+        plies.byteswap()
+    return plies.tobytes()
+
+
+def unpack_plies(data):
+    plies = array("I")
+    plies.frombytes(data)
+    if sys.byteorder == "big":
+        plies.byteswap()
+    return plies
+
+
+class GameHistory:
+    # One int per ply: pawn moves keep the cell they left and the cell they
+    # reached (from << 16 | to << 1), walls their anchor cell and orientation
+    # (cell << 2 | vertical << 1 | 1). Undo and redo are a single make/unmake
+    # on the state, plus the oracle update for walls when an oracle is given.
+    __slots__ = ("state", "oracle", "plies", "tokens", "cursor")
+
+    def __init__(self, state, oracle=None):
+        self.state = state
+        self.oracle = oracle
+        self.plies = array("I")
+        self.tokens = []
+        self.cursor = 0
+
+    @classmethod
+    def replay(cls, start, plies, oracle=None):
+        history = cls(start, oracle)
+        for ply in plies:
+            history.push(ply)
+        return history
+
+    def __len__(self):
+        return self.cursor
+
+    def moves(self):
+        return self.plies[:self.cursor]
+
+    def _apply(self, ply):
+        state = self.state
+        token = None
+        if ply & 1:
+            row, col = divmod(ply >> 2, state.size)
+            orientation = "v" if ply & 2 else "h"
+            state.make_wall(row, col, orientation)
+            if self.oracle is not None:
+                token = self.oracle.add_wall(row, col, orientation)
+        else:
+            state.make_move(ply >> 1 & 0x7fff)
+        self.tokens.append(token)
+        self.cursor += 1
+
+    def push(self, ply):
+        del self.plies[self.cursor:]
+        self.plies.append(ply)
+        self._apply(ply)
+
+    def move(self, target):
+        self.push(self.state.pawns[self.state.turn] << 16 | target << 1)
+
+    def wall(self, row, col, orientation):
+        self.push((row * self.state.size + col) << 2 | (2 if orientation == "v" else 0) | 1)
+
+    def undo(self):
+        if not self.cursor:
+            return False
+        self.cursor -= 1
+        ply = self.plies[self.cursor]
+        token = self.tokens.pop()
+        if ply & 1:
+            row, col = divmod(ply >> 2, self.state.size)
+            if token is not None:
+                self.oracle.undo(token)
+            self.state.unmake_wall(row, col, "v" if ply & 2 else "h")
+        else:
+            self.state.unmake_move(ply >> 16)
+        return True
+
+    def redo(self):
+        if self.cursor == len(self.plies):
+            return False
+        self._apply(self.plies[self.cursor])
+        return True
+
+
+def _segments(mask, size):
+    segments = []
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        segments.append(divmod(low.bit_length() - 1, size))
+    return segments
+
+
+def _frontier(cells):
+    buffers = getattr(_buffers, "value", None)
+    if buffers is None or len(buffers[0]) < cells:
+        buffers = _buffers.value = [array("i", bytes(4 * cells)), array("i", bytes(4 * cells)), 0]
+    buffers[2] += 1
+    if buffers[2] == 1 << 30:
+        buffers[1] = array("i", bytes(4 * len(buffers[1])))
+        buffers[2] = 1
+    return buffers
+
+
+def shortest_distance(h, v, start, goal_row, size=SIZE):
+    # Breadth-first search over a reused array queue; "seen" is an epoch
+    # stamp per cell so nothing has to be cleared between calls.
+    queue, seen, epoch = _frontier(size * size)
+    queue[0] = start
+    seen[start] = epoch
+    head, tail = 0, 1
+    depth, level_end = 0, 1
+    last = size - 1
+    while head < tail:
+        if head == level_end:
+            depth += 1
+            level_end = tail
+        cell = queue[head]
+        head += 1
+        row, col = divmod(cell, size)
+        if row == goal_row:
+            return depth
+        if row < last and not h >> cell & 1 and seen[cell + size] != epoch:
+            seen[cell + size] = epoch
+            queue[tail] = cell + size
+            tail += 1
+        if row > 0 and not h >> (cell - size) & 1 and seen[cell - size] != epoch:
+            seen[cell - size] = epoch
+            queue[tail] = cell - size
+            tail += 1
+        if col < last and not v >> cell & 1 and seen[cell + 1] != epoch:
+            seen[cell + 1] = epoch
+            queue[tail] = cell + 1
+            tail += 1
+        if col > 0 and not v >> (cell - 1) & 1 and seen[cell - 1] != epoch:
+            seen[cell - 1] = epoch
+            queue[tail] = cell - 1
+            tail += 1
+    return -1
+
+
+def wall_edges(row, col, orientation, size=SIZE):
+    i = row * size + col
+    if orientation == "h":
+        return ((i, i + size), (i + 1, i + 1 + size))
+    return ((i, i + 1), (i + size, i + size + 1))
+
+
+def open_neighbours(cell, h, v, size=SIZE):
+    row, col = divmod(cell, size)
+    if row < size - 1 and not h >> cell & 1:
+        yield cell + size
+    if row > 0 and not h >> (cell - size) & 1:
+        yield cell - size
+    if col < size - 1 and not v >> cell & 1:
+        yield cell + 1
+    if col > 0 and not v >> (cell - 1) & 1:
+        yield cell - 1
+
+
+class PathOracle:
+    # Keeps each player's distance-to-goal field for the current walls and
+    # patches only the cells whose shortest path ran through a new wall.
+    __slots__ = ("size", "hwalls", "vwalls", "dist")
+
+    def __init__(self, state):
+        self.rebuild(state)
+
+    def rebuild(self, state):
+        self.size = state.size
+        self.hwalls = state.hwalls
+        self.vwalls = state.vwalls
+        self.dist = [self._field(self.size - 1), self._field(0)]
+
+    def _field(self, goal_row):
+        size = self.size
+        dist = [INF] * (size * size)
+        queue = _frontier(size * size)[0]
+        head, tail = 0, 0
+        for cell in range(goal_row * size, goal_row * size + size):
+            dist[cell] = 0
+            queue[tail] = cell
+            tail += 1
+        while head < tail:
+            cell = queue[head]
+            head += 1
+            d = dist[cell] + 1
+            for nxt in open_neighbours(cell, self.hwalls, self.vwalls, size):
+                if dist[nxt] > d:
+                    dist[nxt] = d
+                    queue[tail] = nxt
+                    tail += 1
+        return dist
+
+    def distance(self, player, cell):
+        return self.dist[player][cell]
+
+    def add_wall(self, row, col, orientation):
+        size = self.size
+        bits = (0b11 if orientation == "h" else 1 | 1 << size) << (row * size + col)
+        if orientation == "h":
+            self.hwalls |= bits
+        else:
+            self.vwalls |= bits
+        edges = wall_edges(row, col, orientation, size)
+        return (orientation, bits, self._raise(self.dist[0], edges), self._raise(self.dist[1], edges))
+
+    def undo(self, token):
+        orientation, bits, changes_p1, changes_p2 = token
+        if orientation == "h":
+            self.hwalls ^= bits
+        else:
+            self.vwalls ^= bits
+        for dist, changes in ((self.dist[0], changes_p1), (self.dist[1], changes_p2)):
+            for cell, d in changes:
+                dist[cell] = d
+
+    def blocks(self, state, row, col, orientation):
+        token = self.add_wall(row, col, orientation)
+        blocked = self.dist[0][state.pawns[0]] >= INF or self.dist[1][state.pawns[1]] >= INF
+        self.undo(token)
+        return blocked
+
+    def _raise(self, dist, edges):
+        h, v, size = self.hwalls, self.vwalls, self.size
+        heap = []
+        for a, b in edges:
+            if dist[a] == dist[b] + 1:
+                heappush(heap, (dist[a], a))
+            elif dist[b] == dist[a] + 1:
+                heappush(heap, (dist[b], b))
+        if not heap:
+            return ()
+
+        # cells that lost every neighbour one step closer to the goal
+        affected = set()
+        while heap:
+            d, cell = heappop(heap)
+            if cell in affected:
+                continue
+            neighbours = list(open_neighbours(cell, h, v, size))
+            if any(dist[n] == d - 1 and n not in affected for n in neighbours):
+                continue
+            affected.add(cell)
+            for n in neighbours:
+                if dist[n] == d + 1 and n not in affected:
+                    heappush(heap, (d + 1, n))
+        if not affected:
+            return ()
+
+        changes = [(cell, dist[cell]) for cell in affected]
+        for cell in affected:
+            best = INF
+            for n in open_neighbours(cell, h, v, size):
+                if n not in affected and dist[n] + 1 < best:
+                    best = dist[n] + 1
+            dist[cell] = best
+            if best < INF:
+                heappush(heap, (best, cell))
+        while heap:
+            d, cell = heappop(heap)
+            if d > dist[cell]:
+                continue
+            for n in open_neighbours(cell, h, v, size):
+                if n in affected and d + 1 < dist[n]:
+                    dist[n] = d + 1
+                    heappush(heap, (d + 1, n))
+        return changes
+
+
+def _cut_labels(state, player):
+    # Spanning tree rooted at the (contracted) goal row. Every non-tree edge
+    # gets a random label and every tree edge the xor of the labels of the
+    # cycles through it, so a bridge has label 0 and two edges with equal
+    # labels form a 2-edge cut.
+    h, v, size = state.hwalls, state.vwalls, state.size
+    goal_row = size - 1 if player == 0 else 0
+    parent = [-2] * (size * size)
+    order = []
+    for cell in range(goal_row * size, goal_row * size + size):
+        parent[cell] = -1
+        order.append(cell)
+    for cell in order:
+        for nxt in open_neighbours(cell, h, v, size):
+            if parent[nxt] == -2:
+                parent[nxt] = cell
+                order.append(nxt)
+
+    down = [None] * (size * size)
+    right = [None] * (size * size)
+    child = {}
+    acc = [0] * (size * size)
+    for a in order:
+        for b, labels in ((a + size, down), (a + 1, right)):
+            if b >= size * size or (labels is right and b % size == 0):
+                continue
+            if labels is down and h >> a & 1 or labels is right and v >> a & 1:
+                continue
+            if parent[a] == -1 and parent[b] == -1:
+                continue
+            if parent[b] == a or parent[a] == b:
+                child[labels is down, a] = b if parent[b] == a else a
+                continue
+            label = _labels.getrandbits(64) or 1
+            labels[a] = label
+            acc[a] ^= label
+            acc[b] ^= label
+    for cell in reversed(order):
+        up = parent[cell]
+        if up < 0:
+            continue
+        if up == cell - size:
+            down[up] = acc[cell]
+        elif up == cell + size:
+            down[cell] = acc[cell]
+        elif up == cell - 1:
+            right[up] = acc[cell]
+        else:
+            right[cell] = acc[cell]
+        acc[up] ^= acc[cell]
+
+    if parent[state.pawns[player]] == -2:
+        return None
+    on_path = set()
+    cell = state.pawns[player]
+    while parent[cell] >= 0:
+        on_path.add(cell)
+        cell = parent[cell]
+    return down, right, child, on_path
+
+
+def _anchor_masks(size):
+    masks = _anchors.get(size)
+    if masks is None:
+        masks = _anchors[size] = (
+            sum(1 << (row * size + col) for row in range(size - 1) for col in range(size - 1)),
+            sum(1 << (row * size + col) for row in range(size - 2) for col in range(size - 1)),
+            sum(1 << (row * size + col) for row in range(size - 1) for col in range(size - 2)),
+        )
+    return masks
+
+
+def legal_walls(state, oracle=None):
+    if state.walls[state.turn] <= 0:
+        return []
+    h, v, size = state.hwalls, state.vwalls, state.size
+    anchors, inner_rows, inner_cols = _anchor_masks(size)
+    free_h = anchors & ~(h | h >> 1) & ~(v & v >> size & inner_rows)
+    free_v = anchors & ~(v | v >> size) & ~(h & h >> 1 & inner_cols)
+    analyses = (_cut_labels(state, 0), _cut_labels(state, 1))
+    if None in analyses:
+        # a pawn already cut off from its goal (the diagonal jump can get
+        # there) fails the path check whatever wall comes next
+        return []
+
+    legal = []
+    for orientation, free in (("h", free_h), ("v", free_v)):
+        is_down = orientation == "h"
+        while free:
+            low = free & -free
+            free ^= low
+            i = low.bit_length() - 1
+            row, col = divmod(i, size)
+            first, second = (i, i + 1) if is_down else (i, i + size)
+            verdict = False
+            for down, right, child, on_path in analyses:
+                labels = down if is_down else right
+                l1, l2 = labels[first], labels[second]
+                if (l1 == 0 and child.get((is_down, first)) in on_path
+                        or l2 == 0 and child.get((is_down, second)) in on_path):
+                    verdict = True
+                    break
+                if l1 and l1 == l2:
+                    verdict = None
+            if verdict is None:
+                if oracle is not None:
+                    verdict = oracle.blocks(state, row, col, orientation)
+                else:
+                    verdict = state.blocks_path(row, col, orientation)
+            if not verdict:
+                legal.append((row, col, orientation))
+    return legal
@@ -1,12 +1,20 @@
 import os
-import json
-import bcrypt
+import atexit
+import base64
 import uuid
 import random
+from contextlib import contextmanager
 from rich.console import Console
 from rich.table import Table
-from rich.panel import Panel
 from datetime import datetime
+from engine import (GameState, PLAYERS, pack_plies, unpack_plies, BLOCKED, NEED_DIAGONAL, DIAGONAL_BLOCKED,
+                    WALL_OK, WALL_OVERLAP, NO_WALLS_LEFT)
+from rules import new_game, apply_move, apply_wall, play, winner, WALL_BLOCKS_PATH
+from ai import AlphaBetaPlayer
+from auth import AuthService
+from render import BoardRenderer, GameScreen
+from storage import (save_json, journal_batch, recover_journal, lock_store, unlock_store, SavedGameArchive,
+                     JsonBackend, SqliteBackend)
 
 console = Console()
 
@@ -14,9 +22,57 @@ USERS_FILE = "users.json"
 GAMES_FILE = "games.json"
 LEADERBOARD_FILE = "leaderboard.json"
 SAVED_GAMES_FILE = "saved_games.json"
-def save_current_game(player1, player2, board, walls, walls_h, walls_v, current_player, start_time):
-    saved_games = load_json(SAVED_GAMES_FILE, [])
+SAVED_GAMES_LOG = "saved_games.log"
+SAVED_GAMES_ARCHIVE = "saved_games.dat"
+SAVED_GAMES_PAGE = 20
+LEADERBOARD_PAGE = 20
+DATABASE_FILE = "wallwizard.db"
+STORAGE_BACKEND = os.environ.get("WALLWIZARD_STORAGE", "json")
+FULL_SCREEN = os.environ.get("WALLWIZARD_TUI", "") == "1"
+BOARD_SIZE = 9
+WALLS_PER_PLAYER = 10
+AI_NAME = "Computer"
+AI_TIME_BUDGET = 2.0
+_backend = None
+_auth = None
+_sessions = {}
 
+def storage_backend():
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "sqlite":
+            _backend = SqliteBackend(DATABASE_FILE)
+            if not _backend.is_migrated():
+                # the JSON files are only read here, under the lock and with
+                # the journal applied
+                recover_journal()
+                saved_games = SavedGameArchive(SAVED_GAMES_ARCHIVE, SAVED_GAMES_LOG, SAVED_GAMES_FILE)
+                _backend.migrate_from_json(USERS_FILE, LEADERBOARD_FILE, saved_games)
+                saved_games.close()
+                unlock_store()
+        else:
+            lock_store()
+            saved_games = SavedGameArchive(SAVED_GAMES_ARCHIVE, SAVED_GAMES_LOG, SAVED_GAMES_FILE)
+            _backend = JsonBackend(USERS_FILE, LEADERBOARD_FILE, saved_games)
+        # closing writes the archive's index snapshot, so the next start
+        # does not have to scan every record
+        atexit.register(close_backend)
+    return _backend
+
+def lock_files():
+    # The JSON backend keeps the archive, the leaderboard and the journal in
+    # this process's memory, so only one process may use them at a time.
+    # SQLite does its own locking and allows concurrent readers.
+    if STORAGE_BACKEND != "sqlite":
+        lock_store()
+
+def close_backend():
+    global _backend
+    if _backend is not None:
+        _backend.close()
+        _backend = None
+
+def saved_game(player1, player2, state, start_time, start=None, moves=None):
     end_time = datetime.now()
     duration = end_time - start_time
 
@@ -26,36 +82,41 @@ def save_current_game(player1, player2, board, walls, walls_h, walls_v, current_
             "player1": player1,
             "player2": player2
         },
-        "board": board,
-        "walls": walls,
-        "walls_h": list(walls_h), 
-        "walls_v": list(walls_v),
-        "current_player": current_player,
         "timestamp": end_time.strftime("%Y-%m-%d %H:%M:%S"),
         "duration": str(duration)
     }
-    
-    saved_games.append(game_state)
-    
-    save_json(SAVED_GAMES_FILE, saved_games)
+    # with a move list only the starting position and the plies are stored;
+    # the current position is rebuilt from them on resume
+    if moves is not None:
+        game_state["start"] = base64.b64encode(start.pack()).decode('ascii')
+        game_state["moves"] = base64.b64encode(pack_plies(moves)).decode('ascii')
+    else:
+        game_state["state"] = base64.b64encode(state.pack()).decode('ascii')
+    return game_state
+
+def save_current_game(player1, player2, state, start_time, start=None, moves=None):
+    game_state = saved_game(player1, player2, state, start_time, start, moves)
+    try:
+        storage_backend().save_game(game_state)
+    except ValueError as error:
+        console.print(f"[red]Game could not be saved: {error}[/red]")
+        return None
     
     console.print(f"[green]Game saved with ID: {game_state['id']}[/green]")
     return game_state['id']
 
-def load_saved_games():
-    saved_games = load_json(SAVED_GAMES_FILE, [])
+def show_saved_games(backend, page, player=None):
+    pages = max(1, -(-backend.count_games(player) // SAVED_GAMES_PAGE))
+    page = min(page, pages - 1)
     
-    if not saved_games:
-        console.print("[yellow]No saved games found.[/yellow]")
-        return None
-    
-    table = Table(title="Saved Games")
+    table = Table(title="Saved Games" if player is None else f"Saved Games with {player}")
     table.add_column("ID", justify="left")
     table.add_column("Player 1", justify="left")
     table.add_column("Player 2", justify="left")
     table.add_column("Timestamp", justify="left")
     table.add_column("Duration", justify="left")
     
+    saved_games = list(backend.list_games(page * SAVED_GAMES_PAGE, SAVED_GAMES_PAGE, player))
     for game in saved_games:
         table.add_row(
             game['id'], 
@@ -66,103 +127,140 @@ def load_saved_games():
         )
     
     console.print(table)
-    return saved_games
-def load_json(file_path, default_value):
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, 'r') as file:
-                return json.load(file)
-        except (json.JSONDecodeError, ValueError):
-            return default_value
-    return default_value
-
-def save_json(file_path, data):
-    with open(file_path, 'w') as file:
-        json.dump(data, file, indent=4)
+    if pages > 1:
+        console.print(f"[cyan]Page {page + 1} of {pages} - enter 'n' or 'p' to change page[/cyan]")
+    return saved_games, page, pages
 
+def load_saved_games(page=0, player=None):
+    backend = storage_backend()
+    
+    if not backend.count_games(player):
+        console.print("[yellow]No saved games found.[/yellow]")
+        return None
+    
+    return show_saved_games(backend, page, player)[0]
 def initialize_files():
-    for file_path, default_value in [(USERS_FILE, {}), (GAMES_FILE, []), (LEADERBOARD_FILE, {})]:
-        if not os.path.exists(file_path):
-            save_json(file_path, default_value)
+    if STORAGE_BACKEND == "sqlite":
+        storage_backend()
+        return
+    recover_journal()
+    with journal_batch():
+        for file_path, default_value in [(USERS_FILE, {}), (GAMES_FILE, []), (LEADERBOARD_FILE, {})]:
+            if not os.path.exists(file_path):
+                save_json(file_path, default_value)
+
+def auth_service():
+    global _auth
+    if _auth is None:
+        _auth = AuthService()
+    return _auth
+
+def open_session(username):
+    _sessions[username] = auth_service().sessions.issue(username)
+
+def has_session(username):
+    token = _sessions.get(username)
+    return token is not None and auth_service().sessions.validate(token) == username
+
+def close_sessions():
+    for token in _sessions.values():
+        auth_service().sessions.revoke(token)
+    _sessions.clear()
 
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return auth_service().hash_password(password).result()
 
 def verify_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    return auth_service().verify_password(password, hashed).result()[0]
 
 
 def sign_up():
-    users = load_json(USERS_FILE, {})
+    backend = storage_backend()
     console.print("[bold cyan]Sign-Up:[/bold cyan]")
     username = console.input("Enter username: ")
     if username == "":
         return '-'
-    if username in users:
+    if username == AI_NAME or backend.get_user(username) is not None:
         console.print("[red]Username already exists![/red]")
         return None
+    if len(username.encode('utf-8')) > SavedGameArchive.NAME_BYTES:
+        console.print("[red]Username is too long![/red]")
+        return None
     email = console.input("Enter email: ")
     password = console.input("Enter password: ", password=True)
     user_id = str(uuid.uuid4())
-    users[username] = {
+    backend.add_user(username, {
         "id": user_id,
         "email": email,
         "password": hash_password(password),
         "games": []
-    }
-    save_json(USERS_FILE, users)
+    })
     console.print("[green]Account created successfully![/green]")
+    open_session(username)
     return username
 
-def login():
-    users = load_json(USERS_FILE, {})
+# A login is split in two so the bcrypt check can run in the background
+# while the next prompt is answered: start_login asks for the credentials and
+# returns (username, pending check), finish_login waits for the check.
+def start_login():
     console.print("[bold cyan]Login:[/bold cyan]")
     username = console.input("Enter username: ")
     if username == "":
-        return '-'
-    if username not in users:
+        return '-', None
+    user = storage_backend().get_user(username)
+    if user is None:
         console.print("[red]Username does not exist![/red]")
-        return None
+        return None, None
     password = console.input("Enter password: ", password=True)
-    if not verify_password(password, users[username]["password"]):
+    return username, auth_service().verify_password(password, user["password"])
+
+def finish_login(username, check):
+    if check is None:
+        return username
+    if not check.done():
+        with console.status("Checking password..."):
+            check.result()
+    ok, rehashed = check.result()
+    if not ok:
         console.print("[red]Incorrect password![/red]")
         return None
+    if rehashed is not None:
+        storage_backend().update_user(username, {"password": rehashed})
     console.print("[green]Login successful![/green]")
+    open_session(username)
     return username
 
-def initialize_board():
-    board = [["." for _ in range(9)] for _ in range(9)]
-    board[0][4] = "P1"
-    board[8][4] = "P2"
-    return board
-def resume_saved_game():
-    saved_games = load_json(SAVED_GAMES_FILE, [])
+def login():
+    return finish_login(*start_login())
+
+def resume_saved_game(player=None, seated=()):
+    backend = storage_backend()
     
-    if not saved_games:
+    if not backend.count_games():
         console.print("[yellow]No saved games found.[/yellow]")
         return None
     
-    table = Table(title="Saved Games")
-    table.add_column("ID", justify="left")
-    table.add_column("Player 1", justify="left")
-    table.add_column("Player 2", justify="left")
-    table.add_column("Timestamp", justify="left")
-    table.add_column("Duration", justify='left')
-    
-    for game in saved_games:
-        table.add_row(
-            game['id'], 
-            game['players']['player1'], 
-            game['players']['player2'], 
-            game['timestamp'],
-            game.get('duration', 'N/A')  
-        )
-    
-    console.print(table)
-    
-    game_id = console.input("Enter the ID of the game you want to resume: ")
+    page = 0
+    involving = None
+    while True:
+        _, page, pages = show_saved_games(backend, page, involving)
+        console.print("[cyan]Enter 'latest' for the most recent game or '@name' to list games involving a player[/cyan]")
+        game_id = console.input("Enter the ID of the game you want to resume: ")
+        if game_id == "n":
+            page = min(page + 1, pages - 1)
+        elif game_id == "p":
+            page = max(page - 1, 0)
+        elif game_id.startswith("@"):
+            involving = game_id[1:] or None
+            page = 0
+        else:
+            break
     
-    selected_game = next((game for game in saved_games if game['id'] == game_id), None)
+    if game_id == "latest":
+        selected_game = backend.latest_game(involving or player)
+        game_id = selected_game['id'] if selected_game else game_id
+    else:
+        selected_game = backend.get_game(game_id)
     
     if not selected_game:
         console.print("[red]Invalid game ID![/red]")
@@ -171,211 +269,137 @@ def resume_saved_game():
     player1 = selected_game['players']['player1']
     player2 = selected_game['players']['player2']
     
-    console.print("[yellow]Authentication required to resume the game:[/yellow]")
+    # the players at the table who still hold a valid session token skip the
+    # password check; anyone else in the game has to log in
+    players = [(number, player) for number, player in ((1, player1), (2, player2))
+               if player != AI_NAME and not (player in seated and has_session(player))]
+    if players:
+        console.print("[yellow]Authentication required to resume the game:[/yellow]")
     
-    console.print(f"[cyan]Login for Player 1 ({player1}):[/cyan]")
-    authenticated_player1 = login()
-    if authenticated_player1 != player1:
-        console.print("[red]Authentication failed for Player 1![/red]")
-        return None
-    
-    console.print(f"[cyan]Login for Player 2 ({player2}):[/cyan]")
-    authenticated_player2 = login()
-    if authenticated_player2 != player2:
-        console.print("[red]Authentication failed for Player 2![/red]")
-        return None
+    logins = []
+    for number, player in players:
+        console.print(f"[cyan]Login for Player {number} ({player}):[/cyan]")
+        logins.append((number, player, start_login()))
     
-    board = selected_game['board']
-    walls = selected_game['walls']
+    for number, player, pending in logins:
+        if finish_login(*pending) != player:
+            console.print(f"[red]Authentication failed for Player {number}![/red]")
+            return None
     
-    walls_h = set(tuple(wall) if isinstance(wall, list) else wall for wall in selected_game['walls_h'])
-    walls_v = set(tuple(wall) if isinstance(wall, list) else wall for wall in selected_game['walls_v'])
-    
-    current_player = selected_game['current_player']
+    moves = None
+    if 'moves' in selected_game:
+        state = GameState.unpack(base64.b64decode(selected_game['start']))
+        moves = unpack_plies(base64.b64decode(selected_game['moves']))
+    elif 'state' in selected_game:
+        state = GameState.unpack(base64.b64decode(selected_game['state']))
+    else:
+        state = GameState.from_saved(
+            selected_game['board'],
+            selected_game['walls'],
+            selected_game['walls_h'],
+            selected_game['walls_v'],
+            selected_game['current_player']
+        )
     
-    saved_games = [game for game in saved_games if game['id'] != game_id]
-    save_json(SAVED_GAMES_FILE, saved_games)
+    backend.delete_game(game_id)
     
     return {
-        'board': board,
-        'walls': walls,
-        'walls_h': walls_h,
-        'walls_v': walls_v,
-        'current_player': current_player,
+        'state': state,
+        'moves': moves,
         'player1': player1,
         'player2': player2
     }
-def draw_board(board, walls_h, walls_v):
-    top_border = "┌───" + "┬───" * 8 + "┐\n"
-    bottom_border = "└───" + "┴───" * 8 + "┘\n"
-    visual = top_border
-    for row in range(9):
-        line = "│"
-        for col in range(9):
-            if (row,col) in walls_v:
-                if board[row][col] == "P1":
-                    line += "⚫ ┃"
-                elif board[row][col] == "P2":
-                    line += "⚪ ┃"
-                else:
-                    line += "   ┃"
-            else:
-                if board[row][col] == "P1":
-                    line += "⚫ │"
-                elif board[row][col] == "P2":
-                    line += "⚪ │"
-                else:
-                    line += "   │"
-                
-        visual += line + "\n"
-        if row < 8:
-            horizontal_line = "├"
-            for col in range(9):
-                if (row, col) in walls_h:
-                    horizontal_line += "═══"
-                else:
-                    horizontal_line += "───"
-                horizontal_line += "┼" if col < 8 else "┤"
-            visual += horizontal_line + "\n"
-    visual += bottom_border
-    console.print(Panel(visual, title="Game Board", expand=False))
+def draw_board(state, renderer=None):
+    if renderer is None:
+        renderer = BoardRenderer(state.size)
+    if renderer.update(state):
+        console.print(renderer.panel)
 
-def play_game(player1, player2):
+@contextmanager
+def game_screen(history, renderer):
+    # With WALLWIZARD_TUI=1 on a real terminal the game runs full screen:
+    # the module console is swapped for a GameScreen until the game ends.
+    global console
+    if not FULL_SCREEN or not console.is_terminal:
+        yield
+        return
+    screen = GameScreen(console, history, renderer)
+    console = screen
+    try:
+        with screen:
+            yield
+    finally:
+        console = screen.console
+
+def play_game(player1, player2, size=BOARD_SIZE, walls=WALLS_PER_PLAYER):
     start_time = datetime.now()
 
+    moves = None
     load_option = console.input("Do you want to load a saved game? (yes/no): ").lower()
-    move_done = False
-    wall_done = False
     if load_option == 'yes':
-        loaded_game = resume_saved_game()
+        loaded_game = resume_saved_game(player1, (player1, player2))
         if loaded_game:
-            board = loaded_game['board']
-            walls = loaded_game['walls']
-            walls_h = loaded_game['walls_h']
-            walls_v = loaded_game['walls_v']
-            current_player = loaded_game['current_player']
+            state = loaded_game['state']
+            moves = loaded_game['moves']
             player1 = loaded_game['player1']
             player2 = loaded_game['player2']
         else:
             console.print("[yellow]Starting a new game instead.[/yellow]")
-            board = initialize_board()
-            walls = {"P1": 10, "P2": 10}
-            walls_h = set()  
-            walls_v = set() 
-            current_player = "P1"
+            state = GameState(size, walls)
            
     else:
-        board = initialize_board()
-        walls = {"P1": 10, "P2": 10}
-        walls_h = set()  
-        walls_v = set()  
-        current_player = "P1"    
-    def dfs(new_walls_h, new_walls_v, i, j, playerName, visited):
-        visited.append((i, j))
-        
-        if playerName == "P1" and i >= 8:
-            return True
-        if playerName == "P2" and i <= 0:
+        state = GameState(size, walls)
+    start = state.copy()
+    history = new_game(start=state, plies=moves or ())
+    computer = AlphaBetaPlayer(AI_TIME_BUDGET) if player2 == AI_NAME else None
+
+    def check_winner():
+        won = winner(state)
+        if won is None:
+            return False
+        console.print(f"[green]{PLAYERS[won]} wins![/green]")
+        with journal_batch():
+            save_current_game(player1, player2, state, start_time, start, history.moves())
+            update_leaderboard(player1 if won == 0 else player2)
+        return True
+
+    def computer_turn(player):
+        move = computer.choose(state)
+        if move is not None:
+            result = play(history, move)
+            # a move the rules refuse counts as having no legal move
+            if (result != WALL_OK) if move[0] == "wall" else (result < 0):
+                move = None
+        if move is None:
+            console.print(f"[yellow]{player} has no legal move and resigns![/yellow]")
+            update_leaderboard(player1)
             return True
-            
-        if 0 <= i <= 8 and 0 <= j <= 8:
-            if i + 1 <= 8 and (i + 1, j) not in visited and (i, j) not in new_walls_h:
-                if dfs(new_walls_h, new_walls_v, i + 1, j, playerName, visited):
-                    return True
-            if i - 1 >= 0 and (i - 1, j) not in visited and (i - 1, j) not in new_walls_h:
-                if dfs(new_walls_h, new_walls_v, i - 1, j, playerName, visited):
-                    return True   
-            if j + 1 <= 8 and (i, j + 1) not in visited and (i, j) not in new_walls_v:
-                if dfs(new_walls_h, new_walls_v, i, j + 1, playerName, visited):
-                    return True
-            if j - 1 >= 0 and (i, j - 1) not in visited and (i, j - 1) not in new_walls_v:
-                if dfs(new_walls_h, new_walls_v, i, j - 1, playerName, visited):
-                    return True
-                    
+        if move[0] == "move":
+            row, col = divmod(move[1], state.size)
+            console.print(f"[cyan]{player} ({AI_NAME}) moved to {row + 1},{col + 1}[/cyan]")
+            return check_winner()
+        _, row, col, orientation = move
+        console.print(f"[cyan]{player} ({AI_NAME}) placed a wall at {row + 1},{col + 1},{orientation}[/cyan]")
         return False
 
     def move_player(player):
         console.print(f"[cyan]{player}, enter your move direction (up/down/left/right):[/cyan]")
         direction = console.input()
-        row, col = [(r, c) for r in range(9) for c in range(9) if board[r][c] == player][0]
-
-        new_row, new_col = row, col
-        if direction == "up" and row > 0 and (row - 1, col) not in walls_h:
-            new_row -= 1
-        elif direction == "down" and row < 8 and (row, col) not in walls_h:
-            new_row += 1
-        elif direction == "left" and col > 0 and (row, col - 1) not in walls_v:
-            new_col -= 1
-        elif direction == "right" and col < 8 and (row, col) not in walls_v:
-            new_col += 1
-        else:
-            console.print("[red]Invalid move. Blocked by a wall or edge of the board. Try again.[/red]")
-            return False
+        target = apply_move(history, direction)
 
-        if board[new_row][new_col] == ".":
-            board[row][col] = "."
-            board[new_row][new_col] = player
-            return True
-        elif board[new_row][new_col] == "P2" or board[new_row][new_col] == "P1":
-    
-            if direction == "up":
-                if new_row >= 1 and (new_row-1,new_col) not in walls_h:
-                    board[row][col] = "."
-                    board[new_row-1][new_col] = player
-                    return True
-                else:
-                    console.print("[red]You can't jump over the oponent!")
-                    console.print("[cyan]You can diagonally move to left or right")
-                    console.print("[cyan]enter your diagnoal move direction (right/left):")
-                    diagonal_direction = console.input()
-                    if diagonal_direction == "right":
-                        if(new_col<8 and ((new_row,new_col) not in walls_v or (new_row,new_col+1) not in walls_h)):
-                            board[row][col] = "."
-                            board[new_row][new_col+1] = player
-                            return True
-                        else:
-                            console.print("[red]Path is blocked by a wall or edge of the board. try something else.")
-                            return False
-                    elif diagonal_direction == "left":
-                        if(new_col>0 and ((new_row,new_col-1) not in walls_v or (new_row,new_col-1) not in walls_h)):
-                            board[row][col] = "."
-                            board[new_row][new_col-1] = player
-                            return True
-                        else:
-                            console.print("[red]Path is blocked by a wall or edge of the board. try something else.")
-                            return False
-                    
-            elif direction == "down":
-                if new_row <=7 and (new_row,new_col) not in walls_h:
-                    board[row][col] = "."
-                    board[new_row+1][new_col] = player
-                    return True
-                else:
-                    console.print("[red]You can't jump over the oponent!")
-                    console.print("[cyan]You can diagonally move to left or right")
-                    console.print("[cyan]enter your diagnoal move direction (right/left):")
-                    diagonal_direction = console.input()
-                    if diagonal_direction == "right":
-                        if(new_col<8 and ((new_row,new_col) not in walls_v or (new_row-1, new_col+1) not in walls_h)):
-                            board[row][col] = "."
-                            board[new_row][new_col+1] = player
-                            return True
-                        else:
-                            console.print("[red]Path is blocked by a wall or edge of the board. try something else.")
-                            return False
-                    elif diagonal_direction == "left":
-                        if(new_col>0 and ((new_row-1,new_col-1) not in walls_h or (new_row,new_col-1) not in walls_v)):
-                            board[row][col] = "."
-                            board[new_row][new_col-1] = player
-                            return True
-                        else:
-                            console.print("[red]Path is blocked by a wall or edge of the board! try something else.")
-                            return False
-            else:
+        if target == NEED_DIAGONAL:
+            console.print("[red]You can't jump over the oponent!")
+            console.print("[cyan]You can diagonally move to left or right")
+            console.print("[cyan]enter your diagnoal move direction (right/left):")
+            diagonal_direction = console.input()
+            target = apply_move(history, direction, diagonal_direction)
+            if target == DIAGONAL_BLOCKED:
+                console.print("[red]Path is blocked by a wall or edge of the board. try something else.")
                 return False
-        else:
-            console.print("[red]Move blocked. Try again.[/red]")
+        if target == BLOCKED:
+            console.print("[red]Invalid move. Blocked by a wall or edge of the board. Try again.[/red]")
             return False
+        return target >= 0
     def place_wall(player):
         console.print(f"[cyan]{player}, enter the wall position (row,col,orientation [h/v]):[/cyan]")
         try:
@@ -383,54 +407,20 @@ def play_game(player1, player2):
             row, col = int(row)-1, int(col)-1
             if orientation not in ("h", "v"):
                 raise ValueError("Invalid orientation")
-            if walls[player] <= 0:
+
+            status = apply_wall(history, row, col, orientation)
+            if status == NO_WALLS_LEFT:
                 console.print("[red]No walls left![/red]")
                 return False
-            
-            if orientation == "h":
-                if col>=0 and col <=7 and row<=7 and row>=0 and (row, col) not in walls_h and (row, col+1) not in walls_h:
-                    if row<7 and (row,col) in walls_v and (row+1,col) in walls_v:
-                        console.print("[red]Walls must not overlap!")
-                        return False
-                    hypothetical_walls_h = walls_h.copy()
-                    hypothetical_walls_v = walls_v.copy()
-                    hypothetical_walls_h.add((row,col))
-                    hypothetical_walls_h.add((row,col+1))
-                    player1Row, player1Col = [(r, c) for r in range(9) for c in range(9) if board[r][c] == "P1"][0]
-                    player2Row, player2Col = [(r2, c2) for r2 in range(9) for c2 in range(9) if board[r2][c2] == "P2"][0]
-                    visitedP1 = []
-                    visitedP2 = []
-                    if not dfs(hypothetical_walls_h , hypothetical_walls_v, player1Row, player1Col, "P1", visitedP1) or not dfs(hypothetical_walls_h , hypothetical_walls_v, player2Row, player2Col, "P2", visitedP2):
-                        console.print("[red]You can't block all paths for a player!")
-                        return False
-                    walls_h.add((row, col))
-                    walls_h.add((row, col+1))
-                else:
-                    console.print("[red]Wall already exists or invalid position![/red]")
-                    return False
-            elif orientation == "v":
-                if row >=0 and row <= 7 and col>=0 and col<=7 and (row, col) not in walls_v and (row+1, col) not in walls_v:
-                    if col<7 and (row,col) in walls_h and (row,col+1) in walls_h:
-                        console.print("[red]Walls must not overlap!")
-                        return False
-                    hypothetical_walls_h = walls_h.copy()
-                    hypothetical_walls_v = walls_v.copy()
-                    hypothetical_walls_v.add((row,col))
-                    hypothetical_walls_v.add((row+1,col))
-                    player1Row, player1Col = [(r, c) for r in range(9) for c in range(9) if board[r][c] == "P1"][0]
-                    player2Row, player2Col = [(r2, c2) for r2 in range(9) for c2 in range(9) if board[r2][c2] == "P2"][0]
-                    visitedP1 = []
-                    visitedP2 = []
-                    if not dfs(hypothetical_walls_h , hypothetical_walls_v, player1Row, player1Col, "P1", visitedP1) or not dfs(hypothetical_walls_h , hypothetical_walls_v, player2Row, player2Col, "P2", visitedP2):
-                        console.print("[red]You can't block all paths for a player!")
-                        return False
-                    walls_v.add((row, col))
-                    walls_v.add((row+1, col))
-                else:
-                    console.print("[red]Wall already exists or invalid position![/red]")
-                    return False
-
-            walls[player] -= 1
+            if status == WALL_OVERLAP:
+                console.print("[red]Walls must not overlap!")
+                return False
+            if status == WALL_BLOCKS_PATH:
+                console.print("[red]You can't block all paths for a player!")
+                return False
+            if status != WALL_OK:
+                console.print("[red]Wall already exists or invalid position![/red]")
+                return False
             return True
         except ValueError:
             console.print("[red]Invalid input. Format should be row,col,orientation (e.g., 3,4,h).[/red]")
@@ -438,60 +428,79 @@ def play_game(player1, player2):
         except Exception:
             console.print("[red]Unexpected error. Try again.[/red]")
             return False
-    while True:
-        draw_board(board, walls_h, walls_v)
+    renderer = BoardRenderer(state.size)
+    with game_screen(history, renderer):
+        while True:
+            draw_board(state, renderer)
+            current_player = state.current_player
+
+            if computer is not None and state.turn == 1:
+                if computer_turn(current_player):
+                    return
+                continue
         
-        action = console.input(f"{current_player}, choose action (move/wall/save/quit): ").strip().lower()
+            action = console.input(f"{current_player}, choose action (move/wall/undo/redo/save/quit): ").strip().lower()
 
-        if action == "save":
-            save_current_game(player1, player2, board, walls, walls_h, walls_v, current_player, start_time)
-            continue
+            if action == "save":
+                save_current_game(player1, player2, state, start_time, start, history.moves())
+                continue
 
-        if action == "quit":
-            console.print("[red]Game quit![/red]")
-            return
+            if action in ("undo", "redo"):
+                step = history.undo if action == "undo" else history.redo
+                if not step():
+                    console.print(f"[yellow]Nothing to {action}![/yellow]")
+                elif computer is not None and state.turn == 1:
+                    # take back or replay the computer's reply as well
+                    step()
+                continue
 
-        if action == "move":
-            if move_player(current_player):
-                p1r, p1c = [(ro, co) for ro in range(9) for co in range(9) if board[ro][co] == "P1"][0]
-                p2r, p2c = [(ro2, co2) for ro2 in range(9) for co2 in range(9) if board[ro2][co2] == "P2"][0]
-                
-                if current_player == "P1" and p1r >= 8:
-                    console.print("[green]P1 wins![/green]")
-                    save_current_game(player1, player2, board, walls, walls_h, walls_v, current_player, start_time)
-                    update_leaderboard(player1)
-                    return
-                elif current_player == "P2" and p2r <= 0:
-                    console.print("[green]P2 wins![/green]")
-                    save_current_game(player1, player2, board, walls, walls_h, walls_v, current_player, start_time)
-                    update_leaderboard(player2)
+            if action == "quit":
+                console.print("[red]Game quit![/red]")
+                return
+
+            if action == "move":
+                if move_player(current_player) and check_winner():
                     return
-                
-                
-                current_player = "P2" if current_player == "P1" else "P1"
-
-        elif action == "wall":
-            if walls[current_player] > 0:
-                if place_wall(current_player):
-                    
-                    current_player = "P2" if current_player == "P1" else "P1"
-            else:
-                console.print("[red]No walls left![/red]")
+
+            elif action == "wall":
+                if state.walls[state.turn] > 0:
+                    place_wall(current_player)
+                else:
+                    console.print("[red]No walls left![/red]")
 def update_leaderboard(winner):
-    leaderboard = load_json(LEADERBOARD_FILE, {})
-    if winner not in leaderboard:
-        leaderboard[winner] = {"wins": 0, "losses": 0}
-    leaderboard[winner]["wins"] += 1
-    save_json(LEADERBOARD_FILE, leaderboard)
+    storage_backend().record_win(winner)
 
 def show_leaderboard():
-    leaderboard = load_json(LEADERBOARD_FILE, {})
-    table = Table(title="Leaderboard")
-    table.add_column("Player", justify="left")
-    table.add_column("Wins", justify="right")
-    for player, stats in sorted(leaderboard.items(), key=lambda x: -x[1]["wins"]):
-        table.add_row(player, str(stats["wins"]))
-    console.print(table)
+    backend = storage_backend()
+    pages = max(1, -(-backend.count_players() // LEADERBOARD_PAGE))
+    page = 0
+    while True:
+        table = Table(title="Leaderboard")
+        table.add_column("Rank", justify="right")
+        table.add_column("Player", justify="left")
+        table.add_column("Wins", justify="right")
+        for rank, player, stats in backend.leaderboard_page(page * LEADERBOARD_PAGE, LEADERBOARD_PAGE):
+            table.add_row(str(rank), player, str(stats["wins"]), style="bold" if has_session(player) else None)
+        console.print(table)
+        for player in list(_sessions):
+            rank = backend.leaderboard_rank(player) if has_session(player) else None
+            if rank is not None:
+                console.print(f"[cyan]{player} is ranked #{rank}[/cyan]")
+        if pages == 1:
+            return
+        choice = console.input(f"Page {page + 1} of {pages} - enter 'n' or 'p' to change page, anything else to go back: ")
+        if choice == "n":
+            page = min(page + 1, pages - 1)
+        elif choice == "p":
+            page = max(page - 1, 0)
+        else:
+            return
+
+def rematch(player1, player2):
+    while all(player == AI_NAME or has_session(player) for player in (player1, player2)):
+        if console.input("Rematch? (yes/no): ").lower() != 'yes':
+            break
+        play_game(player1, player2)
 
 def main_menu():
     initialize_files()
@@ -500,11 +509,13 @@ def main_menu():
         console.print("1. Sign Up")
         console.print("2. Login")
         console.print("3. Show Leaderboard")
-        console.print("4. Quit")
+        console.print("4. Play vs Computer")
+        console.print("5. Quit")
         choice = console.input("Choose an option: ")
 
         if choice == "1":
             sign_up()
+            close_sessions()
 
         elif choice == "2":
             username1 = login()
@@ -536,14 +547,28 @@ def main_menu():
                 if(player2option == "2"):
                     username2 = sign_up()
             if(username2 == '-'):
+                close_sessions()
                 continue
                 
             play_game(username1, username2)  
+            rematch(username1, username2)
+            close_sessions()
 
         elif choice == "3":
             show_leaderboard()
 
         elif choice == "4":
+            username1 = login()
+            while(username1==None):
+                username1 = login()
+            if username1 == '-' :
+                continue
+            play_game(username1, AI_NAME)
+            rematch(username1, AI_NAME)
+            close_sessions()
+
+        elif choice == "5":
+            close_sessions()
             console.print("[bold green]Goodbye![/bold green]")
             break
 
@@ -551,4 +576,9 @@ def main_menu():
             console.print("[red]Invalid option![/red]")
 
 if __name__ == "__main__":
-    main_menu()
+    try:
+        lock_files()
+    except RuntimeError as error:
+        console.print(f"[red]{error}[/red]")
+    else:
+        main_menu()
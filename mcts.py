@@ -0,0 +1,212 @@
+import math
+import numpy as np
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from engine import PathOracle
+from ai import scored_moves
+
+
+class Node:
+    __slots__ = ("move", "player", "key", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, player, key):
+        self.move = move
+        self.player = player
+        self.key = key
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+
+def state_key(state):
+    return (state.hwalls, state.vwalls, state.pawns[0], state.pawns[1], state.walls[0], state.walls[1], state.turn)
+
+
+def _bits(mask, cells):
+    raw = np.frombuffer(mask.to_bytes((cells + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little")[:cells].astype(bool)
+
+
+def neighbour_table(state):
+    size = state.size
+    cells = np.arange(size * size)
+    row, col = cells // size, cells % size
+    h = _bits(state.hwalls, size * size)
+    v = _bits(state.vwalls, size * size)
+    up = (row > 0) & ~h[np.maximum(cells - size, 0)]
+    down = (row < size - 1) & ~h
+    left = (col > 0) & ~v[np.maximum(cells - 1, 0)]
+    right = (col < size - 1) & ~v
+    return np.stack([
+        np.where(up, cells - size, -1),
+        np.where(down, cells + size, -1),
+        np.where(left, cells - 1, -1),
+        np.where(right, cells + 1, -1),
+    ], axis=1)
+
+
+def batch_rollouts(state, dist, rng, count, greedy=0.7, max_steps=None):
+    # Pawn-race playouts on the current walls, all `count` of them advanced
+    # together: each step the mover goes to a random open neighbour, most of
+    # the time one that is closer to its goal. Returns how many P1 won.
+    winner = state.winner()
+    if winner is not None:
+        return count if winner == 0 else 0
+    nbr = neighbour_table(state)
+    dist = np.array(dist, dtype=np.int64)
+    pos = np.empty((2, count), dtype=np.int64)
+    pos[0], pos[1] = state.pawns
+    result = np.full(count, -1)
+    alive = np.ones(count, dtype=bool)
+    index = np.arange(count)
+    turn = state.turn
+    for _ in range(max_steps or 4 * state.size * state.size):
+        cur, other = pos[turn], pos[1 - turn]
+        cand = nbr[cur]
+        valid = (cand >= 0) & (cand != other[:, None])
+        closer = valid & (dist[turn][np.maximum(cand, 0)] < dist[turn][cur][:, None])
+        use_closer = (rng.random(count) < greedy) & closer.any(axis=1)
+        mask = np.where(use_closer[:, None], closer, valid)
+        choice = (rng.random((count, 4)) * mask).argmax(axis=1)
+        step = alive & mask.any(axis=1)
+        pos[turn] = np.where(step, cand[index, choice], cur)
+        won = alive & (dist[turn][pos[turn]] == 0)
+        result[won] = turn
+        alive &= ~won
+        if not alive.any():
+            break
+        turn ^= 1
+    if alive.any():
+        ahead = dist[0][pos[0]] <= dist[1][pos[1]]
+        result[alive] = np.where(ahead[alive], 0, 1)
+    return int((result == 0).sum())
+
+
+class MCTSPlayer:
+    def __init__(self, time_budget=1.0, batch=64, exploration=1.4, workers=1, parallel="process", seed=None,
+                 iterations=None):
+        self.time_budget = time_budget
+        self.batch = batch
+        self.exploration = exploration
+        self.workers = workers
+        self.parallel = parallel
+        self.iterations = iterations
+        self.rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.root = None
+        self.pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def choose(self, state):
+        if self.workers > 1:
+            return self._choose_parallel(state)
+        root = self._reuse(state)
+        self.search(state, root)
+        if not root.children:
+            self.root = None
+            return None
+        best = max(root.children, key=lambda child: child.visits)
+        self.root = best
+        return best.move
+
+    def visit_counts(self, state):
+        root = Node(None, None, state_key(state))
+        self.search(state, root)
+        return {child.move: child.visits for child in root.children}
+
+    def search(self, state, root):
+        self.state = state.copy()
+        self.oracle = PathOracle(self.state)
+        deadline = perf_counter() + self.time_budget
+        done = 0
+        while True:
+            if self.iterations is None:
+                if perf_counter() >= deadline:
+                    break
+            elif done >= self.iterations:
+                break
+            self._iterate(root)
+            done += 1
+
+    def _reuse(self, state):
+        key = state_key(state)
+        if self.root is not None:
+            for child in self.root.children:
+                if child.key == key:
+                    return child
+        return Node(None, None, key)
+
+    def _iterate(self, root):
+        state, oracle = self.state, self.oracle
+        node = root
+        path = [root]
+        made = []
+        while node.untried is not None and not node.untried and node.children:
+            node = self._select(node)
+            made.append((node.move, self._make(node.move)))
+            path.append(node)
+
+        if state.winner() is None:
+            if node.untried is None:
+                scored = scored_moves(state, oracle)
+                scored.sort(key=lambda item: item[0])
+                node.untried = [move for _, move in scored]
+            if node.untried:
+                move = node.untried.pop()
+                player = state.turn
+                made.append((move, self._make(move)))
+                child = Node(move, player, state_key(state))
+                node.children.append(child)
+                node = child
+                path.append(node)
+
+        p1_wins = batch_rollouts(state, oracle.dist, self.rng, self.batch)
+        for move, token in reversed(made):
+            self._unmake(move, token)
+        for node in path:
+            node.visits += self.batch
+            node.wins += p1_wins if node.player == 0 else self.batch - p1_wins
+
+    def _select(self, node):
+        log_visits = math.log(node.visits)
+        c = self.exploration
+        return max(node.children, key=lambda child: child.wins / child.visits + c * math.sqrt(log_visits / child.visits))
+
+    def _make(self, move):
+        if move[0] == "move":
+            return self.state.make_move(move[1])
+        self.state.make_wall(*move[1:])
+        return self.oracle.add_wall(*move[1:])
+
+    def _unmake(self, move, token):
+        if move[0] == "move":
+            self.state.unmake_move(token)
+        else:
+            self.oracle.undo(token)
+            self.state.unmake_wall(*move[1:])
+
+    def _choose_parallel(self, state):
+        if self.pool is None:
+            executor = ProcessPoolExecutor if self.parallel == "process" else ThreadPoolExecutor
+            self.pool = executor(self.workers)
+        base = self.seed if self.seed is not None else int(self.rng.integers(1 << 31))
+        jobs = [self.pool.submit(_root_worker, state, self.time_budget, self.batch, self.exploration, base + i,
+                                 self.iterations)
+                for i in range(self.workers)]
+        totals = {}
+        for job in jobs:
+            for move, visits in job.result().items():
+                totals[move] = totals.get(move, 0) + visits
+        if not totals:
+            return None
+        return max(totals, key=totals.get)
+
+
+def _root_worker(state, time_budget, batch, exploration, seed, iterations):
+    player = MCTSPlayer(time_budget, batch, exploration, seed=seed, iterations=iterations)
+    return player.visit_counts(state)
@@ -0,0 +1,179 @@
+import sys
+import uuid
+import base64
+import argparse
+from time import perf_counter
+from datetime import datetime
+from engine import GameState, GameHistory, PathOracle, SIZE, WALLS, WALL_OK, pack_plies, unpack_plies
+
+# One game per line, tab separated:
+#   player1  player2  timestamp  start  plies
+# start is "-" for the usual opening position, otherwise a packed GameState
+# in base64. Plies are space separated: a pawn move names the square it
+# lands on ("e2"), a wall its anchor square and orientation ("a3h"). Files
+# run a, b, ... from column 0 and ranks 1, 2, ... from row 0, P1's side, so
+# "a3h" is the wall under cells (2, 0) and (2, 1). With one letter per file,
+# boards wider than 26 columns cannot be written.
+FILES = "abcdefghijklmnopqrstuvwxyz"
+TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+
+def square(cell, size=SIZE):
+    row, col = divmod(cell, size)
+    if col >= len(FILES):
+        raise ValueError(f"{size}x{size} boards have no notation")
+    return f"{FILES[col]}{row + 1}"
+
+
+def parse_square(text, size=SIZE):
+    col = FILES.find(text[:1])
+    if col < 0 or col >= size or not text[1:].isdigit():
+        raise ValueError(f"bad square: {text!r}")
+    row = int(text[1:]) - 1
+    if not 0 <= row < size:
+        raise ValueError(f"bad square: {text!r}")
+    return row * size + col
+
+
+def format_ply(ply, size=SIZE):
+    if ply & 1:
+        return square(ply >> 2, size) + ("v" if ply & 2 else "h")
+    return square(ply >> 1 & 0x7fff, size)
+
+
+def parse_ply(text, state, oracle=None):
+    # the GameHistory ply for `text` played from `state`; raises ValueError
+    # unless it is a legal move there
+    if state.winner() is not None:
+        raise ValueError(f"{text}: game is already over")
+    size = state.size
+    if text[-1:] in ("h", "v"):
+        cell = parse_square(text[:-1], size)
+        row, col = divmod(cell, size)
+        orientation = text[-1]
+        if state.wall_status(row, col, orientation) != WALL_OK:
+            raise ValueError(f"{text}: wall cannot be placed")
+        if oracle.blocks(state, row, col, orientation) if oracle is not None else state.blocks_path(row, col, orientation):
+            raise ValueError(f"{text}: wall blocks a path")
+        return cell << 2 | (2 if orientation == "v" else 0) | 1
+    target = parse_square(text, size)
+    if target not in state.pawn_moves():
+        raise ValueError(f"{text}: illegal pawn move")
+    return state.pawns[state.turn] << 16 | target << 1
+
+
+def format_plies(plies, size=SIZE):
+    return " ".join(format_ply(ply, size) for ply in plies)
+
+
+def parse_plies(text, state, oracle=None):
+    # replays `text` on `state` (and `oracle`) and returns the history
+    history = GameHistory(state, oracle if oracle is not None else PathOracle(state))
+    for token in text.split():
+        history.push(parse_ply(token, state, history.oracle))
+    return history
+
+
+def read_games(lines, size=SIZE, walls=WALLS):
+    # Yields saved-game dicts (without an id) one line at a time, so a file
+    # of any length can be piped straight into a backend.
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split("\t")
+        if len(fields) != 5:
+            raise ValueError(f"line {number}: expected 5 tab-separated fields, got {len(fields)}")
+        player1, player2, timestamp, start, plies = fields
+        try:
+            timestamp = datetime.strptime(timestamp, TIMESTAMP).strftime(TIMESTAMP)
+            if len(timestamp) != 19:
+                raise ValueError(timestamp)
+        except ValueError:
+            raise ValueError(f"line {number}: timestamp {fields[2]!r} is not YYYY-MM-DD HH:MM:SS") from None
+        try:
+            state = GameState(size, walls) if start == "-" else GameState.unpack(base64.b64decode(start))
+            if state.size > len(FILES):
+                raise ValueError(f"{state.size}x{state.size} boards have no notation")
+            packed = state.pack()
+            history = parse_plies(plies, state)
+        except ValueError as error:
+            raise ValueError(f"line {number}: {error}") from None
+        yield {
+            "players": {"player1": player1, "player2": player2},
+            "timestamp": timestamp,
+            "start": base64.b64encode(packed).decode('ascii'),
+            "moves": base64.b64encode(pack_plies(history.plies)).decode('ascii')
+        }
+
+
+def write_games(games, size=SIZE, walls=WALLS):
+    # Yields one line per saved-game dict. Snapshot-only saves come out as
+    # their position with no plies.
+    opening = GameState(size, walls).pack()
+    for game in games:
+        players = game["players"]
+        fields = (players["player1"], players["player2"], game["timestamp"])
+        if any("\t" in field or "\n" in field or "\r" in field for field in fields):
+            raise ValueError(f"saved game {game.get('id')} cannot be written as a game record")
+        start = base64.b64decode(game["start"] if "moves" in game else game["state"])
+        plies = unpack_plies(base64.b64decode(game["moves"])) if "moves" in game else ()
+        board = GameState.unpack(start).size
+        if board > len(FILES):
+            raise ValueError(f"saved game {game.get('id')} is on a {board}x{board} board, which has no notation")
+        yield "\t".join(fields + ("-" if start == opening else base64.b64encode(start).decode('ascii'),
+                                  format_plies(plies, board))) + "\n"
+
+
+def import_games(lines, backend, size=SIZE, walls=WALLS):
+    count = 0
+    for game in read_games(lines, size, walls):
+        game["id"] = str(uuid.uuid4())
+        backend.save_game(game)
+        count += 1
+    return count
+
+
+def export_games(file, backend, player=None):
+    count = 0
+    for line in write_games(backend.list_games(player=player)):
+        file.write(line)
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export WallWizard game records")
+    parser.add_argument("command", choices=("import", "export", "check"))
+    parser.add_argument("path", help="game record file, - for stdin/stdout")
+    parser.add_argument("--player", default=None, help="export only this player's games")
+    parser.add_argument("--size", type=int, default=SIZE)
+    parser.add_argument("--walls", type=int, default=WALLS)
+    args = parser.parse_args()
+
+    if args.command != "check":
+        from final import lock_files
+        try:
+            lock_files()
+        except RuntimeError as error:
+            parser.exit(1, f"{error}\n")
+
+    start = perf_counter()
+    if args.command == "export":
+        from final import storage_backend
+        file = sys.stdout if args.path == "-" else open(args.path, 'w', encoding='utf-8', newline='\n')
+        count = export_games(file, storage_backend(), args.player)
+    else:
+        file = sys.stdin if args.path == "-" else open(args.path, encoding='utf-8')
+        if args.command == "check":
+            count = sum(1 for _ in read_games(file, args.size, args.walls))
+        else:
+            from final import storage_backend
+            count = import_games(file, storage_backend(), args.size, args.walls)
+    if file not in (sys.stdin, sys.stdout):
+        file.close()
+    print(f"{args.command}: {count} games in {perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
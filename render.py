@@ -0,0 +1,194 @@
+from time import perf_counter
+from collections import deque
+from rich.control import Control
+from rich.layout import Layout
+from rich.live import Live
+from rich.panel import Panel
+from rich.text import Text
+from engine import PLAYERS
+
+
+class BoardRenderer:
+    # Keeps the lines of the last frame. The borders and the empty cell and
+    # separator rows are built once; each update only rebuilds the rows whose
+    # pawns or wall bits changed, and does nothing when the frame is the same.
+    def __init__(self, size):
+        self.size = size
+        self.row_mask = (1 << size) - 1
+        self.top = "┌───" + "┬───" * (size - 1) + "┐"
+        self.bottom = "└───" + "┴───" * (size - 1) + "┘"
+        self.cell_row = ["│"] + ["   ", "│"] * size
+        self.wall_row = ["├"] + ["───", "┼"] * (size - 1) + ["───", "┤"]
+        self.lines = None
+        self.frame = None
+        self.panel = None
+
+    def _rows(self, mask):
+        rows = set()
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            rows.add((low.bit_length() - 1) // self.size)
+        return rows
+
+    def _cells(self, state, row):
+        line = self.cell_row[:]
+        base = row * self.size
+        walls = state.vwalls >> base & self.row_mask
+        while walls:
+            low = walls & -walls
+            walls ^= low
+            line[2 * low.bit_length()] = "┃"
+        for player, glyph in ((1, "⚪ "), (0, "⚫ ")):
+            cell = state.pawns[player] - base
+            if 0 <= cell < self.size:
+                line[1 + 2 * cell] = glyph
+        return "".join(line)
+
+    def _walls(self, state, row):
+        line = self.wall_row[:]
+        walls = state.hwalls >> (row * self.size) & self.row_mask
+        while walls:
+            low = walls & -walls
+            walls ^= low
+            line[2 * low.bit_length() - 1] = "═══"
+        return "".join(line)
+
+    def update(self, state):
+        # Returns the indexes of the lines that changed; empty if none did.
+        frame = (tuple(state.pawns), state.hwalls, state.vwalls)
+        if frame == self.frame:
+            return []
+        size = self.size
+        if self.lines is None:
+            self.lines = [self.top] + [""] * (2 * size - 1) + [self.bottom]
+            cells, walls = set(range(size)), set(range(size - 1))
+        else:
+            pawns, hwalls, vwalls = self.frame
+            cells = self._rows(vwalls ^ state.vwalls)
+            for old, new in zip(pawns, frame[0]):
+                if old != new:
+                    cells.update((old // size, new // size))
+            walls = self._rows(hwalls ^ state.hwalls)
+        changed = []
+        for row in cells:
+            self.lines[1 + 2 * row] = self._cells(state, row)
+            changed.append(1 + 2 * row)
+        for row in walls:
+            self.lines[2 + 2 * row] = self._walls(state, row)
+            changed.append(2 + 2 * row)
+        self.frame = frame
+        self.panel = Panel("\n".join(self.lines) + "\n", title="Game Board", expand=False)
+        return sorted(changed)
+
+
+class _Tail:
+    # Renders only the last lines that fit the height it is given.
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __rich_console__(self, console, options):
+        height = options.height or len(self.lines)
+        yield Text("\n".join(self.lines[-height:]) if height > 0 else "")
+
+
+class _MoveLog:
+    # A GameHistory's plies as log lines, formatted only when sliced.
+    def __init__(self, history):
+        self.history = history
+
+    def __len__(self):
+        return len(self.history)
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(len(self.history))
+        return [self._line(i) for i in range(start, stop)]
+
+    def _line(self, i):
+        history = self.history
+        player = PLAYERS[history.state.turn ^ (len(history) - i) & 1]
+        ply = history.plies[i]
+        if ply & 1:
+            row, col = divmod(ply >> 2, history.state.size)
+            return f"{i + 1}. {player} wall at {row + 1},{col + 1},{'v' if ply & 2 else 'h'}"
+        row, col = divmod(ply >> 1 & 0x7fff, history.state.size)
+        return f"{i + 1}. {player} moved to {row + 1},{col + 1}"
+
+
+class GameScreen:
+    # Full-screen game view on rich.live.Live: the board and a move log side
+    # by side, a status pane with the latest messages, and the prompt line at
+    # the bottom. It stands in for the console while a game runs, so print()
+    # and input() calls land in the panes. Frames are drawn by hand, at most
+    # `fps` times a second, and always cover the same fixed-size screen, so
+    # a long game costs no more to draw than a short one.
+    def __init__(self, console, history, renderer, fps=15, messages=4):
+        state = history.state
+        self.console = console
+        self.state = state
+        self.renderer = renderer
+        self.interval = 1 / fps
+        self.messages = deque(maxlen=messages)
+        self.prompt = ""
+        self.drawn = 0.0
+        self.layout = Layout()
+        self.layout.split_column(
+            Layout(name="body"),
+            Layout(name="status", size=messages + 3),
+            Layout(name="prompt", size=2)
+        )
+        self.layout["body"].split_row(Layout(name="board", size=4 * state.size + 5), Layout(name="log"))
+        self.layout["log"].update(Panel(_Tail(_MoveLog(history)), title="Moves"))
+        self.live = Live(self.layout, console=console, screen=True, auto_refresh=False,
+                         redirect_stdout=False, redirect_stderr=False)
+
+    def __enter__(self):
+        self.live.start()
+        self._draw(force=True)
+        return self
+
+    def __exit__(self, *exc):
+        self.live.stop()
+        if self.renderer.panel is not None:
+            self.console.print(self.renderer.panel)
+        for message in self.messages:
+            self.console.print(message)
+        return False
+
+    def _status(self):
+        state = self.state
+        lines = [Text(f"{PLAYERS[0]}: {state.walls[0]} walls   {PLAYERS[1]}: {state.walls[1]} walls   "
+                      f"{state.current_player} to play", style="bold")]
+        lines.extend(self.messages)
+        return Panel(Text("\n").join(lines), title="Status")
+
+    def _draw(self, force=False):
+        now = perf_counter()
+        if not force and now - self.drawn < self.interval:
+            return
+        if self.renderer.panel is not None:
+            self.layout["board"].update(self.renderer.panel)
+        self.layout["status"].update(self._status())
+        self.layout["prompt"].update(Text(self.prompt))
+        self.live.refresh()
+        self.drawn = now
+
+    def print(self, *objects, **kwargs):
+        for item in objects:
+            if item is self.renderer.panel:
+                continue
+            if isinstance(item, str):
+                self.messages.append(Text.from_markup(item))
+            else:
+                self.messages.append(item)
+        self._draw()
+
+    def input(self, prompt="", password=False):
+        self.prompt = prompt
+        self._draw(force=True)
+        self.console.control(Control.move_to(len(prompt), self.console.size.height - 2), Control.show_cursor(True))
+        try:
+            return self.console.input(password=password)
+        finally:
+            self.console.show_cursor(False)
+            self.prompt = ""
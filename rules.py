@@ -0,0 +1,57 @@
+from engine import (GameState, GameHistory, PathOracle, SIZE, WALLS, NO_MOVE, WALL_OK, WALL_INVALID,
+                    legal_walls)
+
+# The rules without any console I/O. A game is a GameHistory (state, oracle
+# and ply log), so everything played through here can be undone, saved and
+# written out as notation. apply_move and apply_wall answer with the
+# engine's int codes and only touch the game when the move is legal; they
+# do not check for a finished game, call winner() for that.
+
+# apply_wall result beyond the wall_status ones
+WALL_BLOCKS_PATH = 4
+
+
+def new_game(size=SIZE, walls=WALLS, start=None, plies=()):
+    state = start if start is not None else GameState(size, walls)
+    return GameHistory.replay(state, plies, PathOracle(state))
+
+
+def apply_move(game, direction, diagonal=None):
+    # the cell moved to, or a move_target code (BLOCKED, NEED_DIAGONAL, ...)
+    target = game.state.move_target(direction, diagonal)
+    if target >= 0:
+        game.move(target)
+    return target
+
+
+def apply_wall(game, row, col, orientation):
+    # WALL_OK once placed, otherwise a wall_status code or WALL_BLOCKS_PATH
+    state, oracle = game.state, game.oracle
+    if orientation != "h" and orientation != "v":
+        return WALL_INVALID
+    status = state.wall_status(row, col, orientation)
+    if status != WALL_OK:
+        return status
+    if oracle.blocks(state, row, col, orientation) if oracle is not None else state.blocks_path(row, col, orientation):
+        return WALL_BLOCKS_PATH
+    game.wall(row, col, orientation)
+    return WALL_OK
+
+
+def legal_moves(state, oracle=None):
+    # ("move", cell) and ("wall", row, col, orientation), as the bots use
+    return [("move", target) for target in state.pawn_moves()] + [("wall",) + wall for wall in legal_walls(state, oracle)]
+
+
+def play(game, move):
+    # applies a bot-style move tuple, checking it like the other calls
+    if move[0] == "move":
+        if move[1] not in game.state.pawn_moves():
+            return NO_MOVE
+        game.move(move[1])
+        return move[1]
+    return apply_wall(game, *move[1:])
+
+
+def winner(state):
+    return state.winner()
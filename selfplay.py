@@ -0,0 +1,89 @@
+import os
+import json
+import argparse
+from functools import partial
+from multiprocessing import Pool
+from time import perf_counter
+from engine import GameState, PLAYERS, SIZE, WALLS
+from ai import AlphaBetaPlayer, RandomPlayer
+from mcts import MCTSPlayer
+
+PLAYER_TYPES = ("alphabeta", "mcts", "random")
+
+
+def make_player(kind, budget, seed):
+    if kind == "alphabeta":
+        return AlphaBetaPlayer(budget)
+    if kind == "mcts":
+        return MCTSPlayer(budget, seed=seed)
+    if kind == "random":
+        return RandomPlayer(seed=seed)
+    raise ValueError(f"Unknown player type: {kind}")
+
+
+def play_headless(seed, size=SIZE, walls=WALLS, players=("alphabeta", "alphabeta"), budget=0.1, max_plies=400):
+    state = GameState(size, walls)
+    bots = [make_player(kind, budget, seed * 2 + i) for i, kind in enumerate(players)]
+    plies = 0
+    start = perf_counter()
+    while state.winner() is None and plies < max_plies:
+        move = bots[state.turn].choose(state)
+        if move is None:
+            break
+        if move[0] == "move":
+            state.make_move(move[1])
+        else:
+            state.make_wall(*move[1:])
+        plies += 1
+    winner = state.winner()
+    return {
+        "seed": seed,
+        "players": list(players),
+        "size": size,
+        "winner": PLAYERS[winner] if winner is not None else None,
+        "plies": plies,
+        "walls_used": [walls - state.walls[0], walls - state.walls[1]],
+        "duration": round(perf_counter() - start, 4)
+    }
+
+
+def run_selfplay(games, output, workers=None, first_seed=0, **options):
+    workers = workers or os.cpu_count() or 1
+    play = partial(play_headless, **options)
+    seeds = range(first_seed, first_seed + games)
+    wins = {"P1": 0, "P2": 0, None: 0}
+    with open(output, 'a') as file, Pool(workers) as pool:
+        for result in pool.imap_unordered(play, seeds, chunksize=max(1, games // (workers * 8))):
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+            wins[result["winner"]] += 1
+    return wins
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless WallWizard self-play")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="selfplay_results.jsonl")
+    parser.add_argument("--size", type=int, default=SIZE)
+    parser.add_argument("--walls", type=int, default=WALLS)
+    parser.add_argument("--player1", choices=PLAYER_TYPES, default="alphabeta")
+    parser.add_argument("--player2", choices=PLAYER_TYPES, default="alphabeta")
+    parser.add_argument("--budget", type=float, default=0.1, help="seconds per alpha-beta/MCTS move")
+    parser.add_argument("--max-plies", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = perf_counter()
+    wins = run_selfplay(
+        args.games, args.output, args.workers, args.seed,
+        size=args.size, walls=args.walls, players=(args.player1, args.player2),
+        budget=args.budget, max_plies=args.max_plies
+    )
+    elapsed = perf_counter() - start
+    print(f"P1 wins: {wins['P1']}, P2 wins: {wins['P2']}, unfinished: {wins[None]} "
+          f"({args.games} games in {elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
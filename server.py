@@ -0,0 +1,306 @@
+import os
+import base64
+import asyncio
+import argparse
+import traceback
+from datetime import datetime
+from engine import (PLAYERS, BLOCKED, NO_MOVE, NEED_DIAGONAL, DIAGONAL_BLOCKED, WALL_OK, WALL_INVALID, WALL_OVERLAP,
+                    NO_WALLS_LEFT)
+from rules import new_game, apply_move, apply_wall, winner, WALL_BLOCKS_PATH
+from notation import format_ply
+import final
+
+HOST = os.environ.get("WALLWIZARD_HOST", "127.0.0.1")
+PORT = int(os.environ.get("WALLWIZARD_PORT", "7878"))
+MAX_LINE = 1024
+MAX_PENDING = 64 * 1024
+IDLE_TIMEOUT = 30 * 60
+
+# One request per line, one or more reply lines back:
+#   LOGIN <username> <password>   -> OK LOGIN <username> <session token>
+#   TOKEN <session token>         -> OK LOGIN <username>
+#   PLAY                          -> WAIT, then MATCH <P1|P2> <opponent> and TURN P1
+#   MOVE <direction> [left|right] -> PLAYED <P1|P2> <ply>, then TURN or WINNER
+#   WALL <row>,<col>,<h|v>        -> the same; rows and columns count from 1
+#   BOARD                         -> BOARD <packed state, base64>
+#   RESIGN, PING, QUIT
+# Failures answer ERR <reason>. Plies are in notation.py's notation.
+MOVE_ERRORS = {
+    BLOCKED: "blocked by a wall or the edge of the board",
+    NO_MOVE: "no such move",
+    NEED_DIAGONAL: "cannot jump over the opponent, add left or right",
+    DIAGONAL_BLOCKED: "diagonal path is blocked",
+}
+WALL_ERRORS = {
+    WALL_INVALID: "wall already exists or invalid position",
+    WALL_OVERLAP: "walls must not overlap",
+    NO_WALLS_LEFT: "no walls left",
+    WALL_BLOCKS_PATH: "cannot block all paths for a player",
+}
+
+
+class Client:
+    __slots__ = ("writer", "name", "token", "match", "seat")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.name = None
+        self.token = None
+        self.match = None
+        self.seat = None
+
+    def send(self, line):
+        # Output is never awaited, so a peer that stops reading cannot stall
+        # the other player; once too much is pending it is disconnected.
+        if self.writer.is_closing():
+            return
+        self.writer.write(line.encode('utf-8') + b"\n")
+        if self.writer.transport.get_write_buffer_size() > MAX_PENDING:
+            self.writer.transport.abort()
+
+
+class Match:
+    __slots__ = ("clients", "game", "start", "start_time")
+
+    def __init__(self, first, second):
+        self.clients = (first, second)
+        self.game = new_game()
+        self.start = self.game.state.copy()
+        self.start_time = datetime.now()
+
+    def send(self, line):
+        for client in self.clients:
+            client.send(line)
+
+
+class GameServer:
+    # All state lives on the event loop: an idle connection is one parked
+    # readline. Only bcrypt leaves the loop, through AuthService's pool.
+    # With the JSON backend the server owns the data files while it runs
+    # (final.lock_files), so the console app cannot use the same directory
+    # at the same time; with SQLite they can share the database.
+    def __init__(self, backend=None, auth=None, idle_timeout=IDLE_TIMEOUT):
+        self.backend = backend if backend is not None else final.storage_backend()
+        self.auth = auth if auth is not None else final.auth_service()
+        self.idle_timeout = idle_timeout
+        self.waiting = None
+        self.connections = 0
+        self.server = None
+
+    async def start(self, host=HOST, port=PORT):
+        self.server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        return self.server
+
+    async def handle(self, reader, writer):
+        client = Client(writer)
+        self.connections += 1
+        client.send("WALLWIZARD 1")
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except ValueError:
+                    client.send("ERR line too long")
+                    break
+                except asyncio.TimeoutError:
+                    client.send("ERR idle timeout")
+                    break
+                if not line:
+                    break
+                command, _, rest = line.decode('utf-8', 'replace').strip().partition(" ")
+                command = command.upper()
+                if command == "QUIT":
+                    if client.token is not None:
+                        self.auth.sessions.revoke(client.token)
+                    client.send("BYE")
+                    break
+                handler = getattr(self, "do_" + command.lower(), None)
+                if handler is None or not command.isalpha():
+                    client.send(f"ERR unknown command {command}")
+                    continue
+                try:
+                    await handler(client, rest.strip())
+                except ConnectionError:
+                    raise
+                except Exception:
+                    # a bug in one request must not drop the connection
+                    traceback.print_exc()
+                    client.send("ERR internal error")
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self.leave(client)
+            writer.close()
+
+    def leave(self, client):
+        if self.waiting is client:
+            self.waiting = None
+        match = client.match
+        if match is not None and winner(match.game.state) is None:
+            # keep an abandoned game so it can be resumed from the console
+            game = final.saved_game(match.clients[0].name, match.clients[1].name, match.game.state,
+                                    match.start_time, match.start, match.game.moves())
+            self.backend.save_game(game)
+            for other in match.clients:
+                other.match = None
+                if other is not client:
+                    other.send(f"ABORTED {client.name} left, game saved as {game['id']}")
+
+    async def do_ping(self, client, rest):
+        client.send("PONG")
+
+    async def do_login(self, client, rest):
+        if client.match is not None:
+            client.send("ERR already playing")
+            return
+        username, _, password = rest.partition(" ")
+        user = self.backend.get_user(username) if username else None
+        if user is None:
+            client.send("ERR username does not exist")
+            return
+        ok, rehashed = await self.auth.verify_password_async(password, user["password"])
+        if not ok:
+            client.send("ERR incorrect password")
+            return
+        if rehashed is not None:
+            self.backend.update_user(username, {"password": rehashed})
+        self.signed_in(client, username)
+        client.token = self.auth.sessions.issue(username)
+        client.send(f"OK LOGIN {username} {client.token}")
+
+    async def do_token(self, client, rest):
+        if client.match is not None:
+            client.send("ERR already playing")
+            return
+        username = self.auth.sessions.validate(rest)
+        if username is None:
+            client.send("ERR invalid or expired session")
+            return
+        self.signed_in(client, username)
+        client.send(f"OK LOGIN {username}")
+
+    def signed_in(self, client, username):
+        if self.waiting is client:
+            self.waiting = None
+        if client.token is not None:
+            self.auth.sessions.revoke(client.token)
+            client.token = None
+        client.name = username
+
+    async def do_play(self, client, rest):
+        if client.name is None:
+            client.send("ERR log in first")
+            return
+        if client.match is not None:
+            client.send("ERR already playing")
+            return
+        waiting = self.waiting
+        if waiting is None or waiting is client:
+            self.waiting = client
+            client.send("WAIT")
+            return
+        if waiting.name == client.name:
+            client.send("ERR cannot play against yourself")
+            return
+        self.waiting = None
+        match = Match(waiting, client)
+        for seat, player in enumerate(match.clients):
+            player.match, player.seat = match, seat
+            player.send(f"MATCH {PLAYERS[seat]} {match.clients[1 - seat].name}")
+        match.send(f"TURN {PLAYERS[0]}")
+
+    def turn(self, client):
+        match = client.match
+        if match is None:
+            client.send("ERR not in a game")
+            return None
+        if match.game.state.turn != client.seat:
+            client.send("ERR not your turn")
+            return None
+        return match
+
+    async def do_move(self, client, rest):
+        match = self.turn(client)
+        if match is None:
+            return
+        direction, _, diagonal = rest.lower().partition(" ")
+        result = apply_move(match.game, direction, diagonal or None)
+        if result < 0:
+            client.send(f"ERR {MOVE_ERRORS[result]}")
+            return
+        self.played(match, client)
+
+    async def do_wall(self, client, rest):
+        match = self.turn(client)
+        if match is None:
+            return
+        try:
+            row, col, orientation = rest.lower().replace(" ", "").split(",")
+            row, col = int(row) - 1, int(col) - 1
+        except ValueError:
+            client.send("ERR format should be row,col,orientation (e.g. 3,4,h)")
+            return
+        result = apply_wall(match.game, row, col, orientation)
+        if result != WALL_OK:
+            client.send(f"ERR {WALL_ERRORS[result]}")
+            return
+        self.played(match, client)
+
+    async def do_resign(self, client, rest):
+        match = client.match
+        if match is None:
+            client.send("ERR not in a game")
+            return
+        self.finish(match, 1 - client.seat)
+
+    async def do_board(self, client, rest):
+        if client.match is None:
+            client.send("ERR not in a game")
+            return
+        client.send("BOARD " + base64.b64encode(client.match.game.state.pack()).decode('ascii'))
+
+    def played(self, match, client):
+        game = match.game
+        match.send(f"PLAYED {PLAYERS[client.seat]} {format_ply(game.plies[len(game) - 1], game.state.size)}")
+        won = winner(game.state)
+        if won is None:
+            match.send(f"TURN {PLAYERS[game.state.turn]}")
+        else:
+            self.finish(match, won)
+
+    def finish(self, match, won):
+        names = [client.name for client in match.clients]
+        game = final.saved_game(names[0], names[1], match.game.state, match.start_time, match.start,
+                                match.game.moves())
+        self.backend.save_game(game)
+        self.backend.record_win(names[won])
+        match.send(f"WINNER {PLAYERS[won]} {names[won]}")
+        for client in match.clients:
+            client.match = None
+
+
+async def serve(host=HOST, port=PORT):
+    server = await GameServer().start(host, port)
+    print(f"WallWizard server on {', '.join(str(sock.getsockname()) for sock in server.sockets)}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WallWizard network game server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    try:
+        final.lock_files()
+    except RuntimeError as error:
+        parser.exit(1, f"{error}\n")
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1005 @@
+import os
+import json
+import mmap
+import base64
+import atexit
+import struct
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from engine import GameState
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+STORE_LOCK_FILE = "wallwizard.lock"
+_store_lock = None
+
+JOURNAL_FILE = "wallwizard.journal"
+JOURNAL_CHECKPOINT_BYTES = 1 << 20
+
+_journal_lock = threading.RLock()
+_journal = None
+_pending = None
+_unsynced = set()
+_dirty = {}
+
+JSON_CACHE_MAX_BYTES = 16 << 20
+JSON_CACHE_MAX_ENTRIES = 64
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+# load_json keeps parsed documents keyed by path and reuses them while the
+# file's mtime and size are unchanged. The returned object is shared:
+# callers that modify it must write it back with save_json.
+
+def load_json(file_path, default_value):
+    with _journal_lock:
+        if _pending is not None and file_path in _pending:
+            return _pending[file_path][1]
+        if file_path in _dirty:
+            return _dirty[file_path]
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return default_value
+    with _cache_lock:
+        entry = _cache.get(file_path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            _cache.move_to_end(file_path)
+            _cache_stats["hits"] += 1
+            return entry[2]
+        _cache_stats["misses"] += 1
+    try:
+        with open(file_path, 'r') as file:
+            data = json.load(file)
+    except (json.JSONDecodeError, ValueError):
+        return default_value
+    _remember(file_path, stat, data)
+    return data
+
+def save_json(file_path, data):
+    text = json.dumps(data, indent=4)
+    with _journal_lock:
+        if _pending is not None:
+            _pending[file_path] = (text, data)
+        else:
+            _commit({file_path: text})
+            _remember(file_path, os.stat(file_path), data)
+
+
+def save_json_key(file_path, data, key):
+    # Like save_json after changing data[key], but only that entry goes to
+    # the journal; the file itself is rewritten at the next checkpoint, so a
+    # change costs one small journal record however large the document is.
+    # Inside a journal_batch the whole document is written with the batch.
+    with _journal_lock:
+        if _pending is not None:
+            save_json(file_path, data)
+            return
+        _commit({}, {file_path: (data, key)})
+
+
+def _remember(file_path, stat, data):
+    global _cache_bytes
+    with _cache_lock:
+        old = _cache.pop(file_path, None)
+        if old is not None:
+            _cache_bytes -= old[1]
+        if stat.st_size > JSON_CACHE_MAX_BYTES:
+            return
+        _cache[file_path] = (stat.st_mtime_ns, stat.st_size, data)
+        _cache_bytes += stat.st_size
+        while _cache_bytes > JSON_CACHE_MAX_BYTES or len(_cache) > JSON_CACHE_MAX_ENTRIES:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= evicted[1]
+            _cache_stats["evictions"] += 1
+
+
+def json_cache_stats():
+    with _cache_lock:
+        return dict(_cache_stats, entries=len(_cache), bytes=_cache_bytes)
+
+
+# Every JSON write goes through a write-ahead journal: the new documents
+# are appended to JOURNAL_FILE and fsynced once per batch, then each file
+# is replaced atomically (temp file + rename) without its own fsync.
+# save_json_key journals a single entry instead and leaves the file to the
+# next checkpoint, which writes those documents, fsyncs the replaced files
+# and empties the journal. After a crash recover_journal() re-applies
+# every committed batch in order.
+
+@contextmanager
+def journal_batch():
+    global _pending
+    with _journal_lock:
+        if _pending is not None:
+            yield
+            return
+        _pending = {}
+        try:
+            yield
+            pending = _pending
+        finally:
+            _pending = None
+        if pending:
+            _commit({path: text for path, (text, _) in pending.items()})
+            for path, (_, data) in pending.items():
+                _remember(path, os.stat(path), data)
+
+
+def _replace(file_path, text, sync):
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.write(text)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def _fsync_path(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _commit(documents, entries=None):
+    global _journal
+    if _journal is None:
+        recover_journal()
+        _journal = open(JOURNAL_FILE, 'ab')
+    records = [json.dumps({"path": path, "data": text}) for path, text in documents.items()]
+    if entries:
+        records.extend(json.dumps({"path": path, "key": key, "value": data[key]})
+                       for path, (data, key) in entries.items())
+    records.append(json.dumps({"commit": len(records)}))
+    _journal.write(("\n".join(records) + "\n").encode('utf-8'))
+    _journal.flush()
+    os.fsync(_journal.fileno())
+    for path, text in documents.items():
+        _replace(path, text, sync=False)
+        _unsynced.add(path)
+        _dirty.pop(path, None)
+    if entries:
+        for path, (data, _) in entries.items():
+            _dirty[path] = data
+    if _journal.tell() >= JOURNAL_CHECKPOINT_BYTES:
+        checkpoint()
+
+
+def lock_store(path=STORE_LOCK_FILE):
+    # Only one process may use the JSON data files at a time. The archive,
+    # the leaderboard and the journal keep state in memory that a second
+    # process would silently overwrite, so the second one fails here
+    # instead. The lock is held until unlock_store() or the process exits.
+    global _store_lock
+    if _store_lock is not None:
+        return
+    file = open(path, 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        file.close()
+        raise RuntimeError(f"another WallWizard process is using these files ({path} is locked)") from None
+    _store_lock = file
+
+
+def unlock_store():
+    global _store_lock
+    if _store_lock is not None:
+        checkpoint()
+        _store_lock.close()
+        _store_lock = None
+
+
+def checkpoint():
+    global _journal
+    if _store_lock is None:
+        # never touched the store, so the journal (if any) is not ours
+        return
+    with _journal_lock:
+        for path, data in _dirty.items():
+            _replace(path, json.dumps(data, indent=4), sync=True)
+            _remember(path, os.stat(path), data)
+            _unsynced.add(path)
+        _dirty.clear()
+        for path in _unsynced:
+            _fsync_path(path)
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in _unsynced}:
+            _fsync_path(directory)
+        _unsynced.clear()
+        if _journal is not None:
+            _journal.close()
+            _journal = None
+        if os.path.exists(JOURNAL_FILE):
+            os.remove(JOURNAL_FILE)
+
+
+def recover_journal():
+    lock_store()
+    with _journal_lock:
+        if _journal is not None or not os.path.exists(JOURNAL_FILE):
+            return 0
+        applied = 0
+        documents = {}
+        batch = []
+        with open(JOURNAL_FILE, 'rb') as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                if "commit" not in record:
+                    batch.append(record)
+                    continue
+                for record in batch:
+                    path = record["path"]
+                    if "data" in record:
+                        documents[path] = json.loads(record["data"])
+                    else:
+                        if path not in documents:
+                            documents[path] = load_json(path, {})
+                        documents[path][record["key"]] = record["value"]
+                applied += len(batch)
+                batch = []
+        for path, data in documents.items():
+            _replace(path, json.dumps(data, indent=4), sync=True)
+            _fsync_path(os.path.dirname(os.path.abspath(path)))
+        os.remove(JOURNAL_FILE)
+        return applied
+
+
+atexit.register(checkpoint)
+
+
+def _read_saved_game_log(log_path):
+    # The live games in the append-only log SavedGameArchive replaced, one
+    # JSON record per line: a "put" saves a game, a "del" tombstone removes
+    # it. Only read now, to migrate an old log into the archive.
+    offsets = {}
+    with open(log_path, 'rb') as file:
+        offset = 0
+        for line in file:
+            if not line.endswith(b"\n"):
+                # a torn last line from a crash mid-append
+                break
+            record = json.loads(line)
+            if record["op"] == "put":
+                offsets[record["game"]["id"]] = offset
+            else:
+                offsets.pop(record["id"], None)
+            offset += len(line)
+        for offset in offsets.values():
+            file.seek(offset)
+            yield json.loads(file.readline())["game"]
+
+
+class GameIndex:
+    # Primary (id -> slot) and secondary (player, timestamp) indexes over the
+    # live records of a SavedGameArchive. Secondary entries are sorted
+    # (timestamp, slot) pairs so the newest game is always the last one.
+    def __init__(self):
+        self.ids = {}
+        self.slots = []
+        self.players = {}
+        self.times = []
+
+    def add(self, game_id, player1, player2, timestamp, slot):
+        self.ids[game_id] = slot
+        if self.slots and slot < self.slots[-1]:
+            insort(self.slots, slot)
+        else:
+            self.slots.append(slot)
+        entry = (timestamp, slot)
+        insort(self.times, entry)
+        for player in {player1, player2}:
+            insort(self.players.setdefault(player, []), entry)
+
+    def remove(self, game_id, player1, player2, timestamp, slot):
+        if self.ids.get(game_id) == slot:
+            del self.ids[game_id]
+        del self.slots[bisect_left(self.slots, slot)]
+        entry = (timestamp, slot)
+        del self.times[bisect_left(self.times, entry)]
+        for player in {player1, player2}:
+            entries = self.players[player]
+            del entries[bisect_left(entries, entry)]
+            if not entries:
+                del self.players[player]
+
+    def save(self, path, used):
+        _replace(path, json.dumps({
+            "used": used,
+            "ids": list(self.ids),
+            "id_slots": list(self.ids.values()),
+            "times": [timestamp for timestamp, _ in self.times],
+            "time_slots": [slot for _, slot in self.times],
+            "players": {player: [slot for _, slot in entries] for player, entries in self.players.items()}
+        }, separators=(",", ":")), sync=True)
+
+    @classmethod
+    def build(cls, ids, keys):
+        # keys: slot -> (player1, player2, timestamp) for every live slot
+        index = cls()
+        index.ids = ids
+        index.slots = sorted(keys)
+        index.times = sorted((keys[slot][2], slot) for slot in index.slots)
+        for entry in index.times:
+            player1, player2, _ = keys[entry[1]]
+            index.players.setdefault(player1, []).append(entry)
+            if player2 != player1:
+                index.players.setdefault(player2, []).append(entry)
+        return index
+
+    @classmethod
+    def load(cls, path, used):
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError, ValueError):
+            return None
+        if data.get("used") != used:
+            return None
+        index = cls()
+        index.ids = dict(zip(data["ids"], data["id_slots"]))
+        index.slots = sorted(data["id_slots"])
+        index.times = list(zip(data["times"], data["time_slots"]))
+        stamps = dict(zip(data["time_slots"], data["times"]))
+        index.players = {player: [(stamps[slot], slot) for slot in slots]
+                         for player, slots in data["players"].items()}
+        return index
+
+
+class SavedGameArchive:
+    # Saved games as fixed-size records in a memory-mapped file, appended in
+    # save order. Resuming clears a record's live flag; once enough records
+    # are dead the file is rewritten without them. Only the records that are
+    # looked up or listed get decoded.
+    #
+    # The GameIndex is written to <path>.idx on close and removed again on
+    # open, so it is only trusted after a clean shutdown; otherwise it is
+    # rebuilt by scanning the records.
+    #
+    # Games saved with a move list keep their starting position in the
+    # record (flag bit 1 set) and their plies in <path>.moves, found by the
+    # offset and count at the end of the record. A position too big for the
+    # record (boards from 19x19 up) goes to <path>.moves as well, just ahead
+    # of the plies (flag bit 2 set), and the record keeps only its length.
+    HEADER = struct.Struct("<4sHHQ")
+    RECORD = struct.Struct("<B36s64s64s19s32sB96sIHx")
+    KEYS = struct.Struct("<B36s64s64s19s")
+    MOVES = struct.Struct("<IH")
+    MOVES_AT = RECORD.size - MOVES.size - 1
+    STATE_BYTES = 96
+    STATE_LENGTH = struct.Struct("<H")
+    NAME_BYTES = 64
+    MAGIC = b"WWSG"
+    VERSION = 1
+    PAGE = 256
+
+    def __init__(self, path, log_path=None, legacy_path=None, compact_ratio=1.0, compact_min=1024):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.moves_path = path + ".moves"
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self.lock = threading.RLock()
+        self.compactor = None
+        if not os.path.exists(path):
+            self._migrate(log_path, legacy_path)
+        self._open()
+
+    def _migrate(self, log_path, legacy_path):
+        # from the append-only log, or before that the single JSON list
+        source, games = None, ()
+        if log_path and os.path.exists(log_path):
+            source, games = log_path, _read_saved_game_log(log_path)
+        elif legacy_path and os.path.exists(legacy_path):
+            source = legacy_path
+            try:
+                with open(legacy_path, 'r') as file:
+                    games = json.load(file)
+            except (json.JSONDecodeError, ValueError):
+                games = []
+        records = []
+        with open(self.moves_path, 'wb') as heap:
+            for game in games:
+                record, extra = self._encode(game, heap.tell())
+                heap.write(extra)
+                records.append(record)
+            heap.flush()
+            os.fsync(heap.fileno())
+        self._write(self.path + ".tmp", records)
+        os.replace(self.path + ".tmp", self.path)
+        if source is not None:
+            os.replace(source, source + ".migrated")
+
+    def _write(self, path, records):
+        with open(path, 'wb') as file:
+            file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.RECORD.size, len(records)))
+            for record in records:
+                file.write(record)
+            file.truncate(self.HEADER.size + max(len(records) * 2, 1024) * self.RECORD.size)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _finish_compaction(self):
+        # Compaction creates <path>.tmp before it starts <path>.moves.tmp and
+        # renames it over the archive only once both are complete, so while
+        # <path>.tmp exists the old files are still current. A new moves file
+        # left without it belongs to the archive that was already replaced.
+        if os.path.exists(self.path + ".tmp"):
+            os.remove(self.path + ".tmp")
+            if os.path.exists(self.moves_path + ".tmp"):
+                os.remove(self.moves_path + ".tmp")
+        elif os.path.exists(self.moves_path + ".tmp"):
+            os.replace(self.moves_path + ".tmp", self.moves_path)
+
+    def _open(self):
+        self._finish_compaction()
+        self.heap = open(self.moves_path, 'a+b')
+        self.file = open(self.path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, version, record_size, used = self.HEADER.unpack_from(self.map)
+        if magic != self.MAGIC or version != self.VERSION or record_size != self.RECORD.size:
+            raise ValueError(f"{self.path} is not a saved-game archive")
+        self.used = used
+        self.capacity = (len(self.map) - self.HEADER.size) // self.RECORD.size
+        self.index = GameIndex.load(self.index_path, used)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        if self.index is None:
+            self.index = self._scan()
+        self.dead = used - len(self.index.slots)
+
+    def _scan(self):
+        ids = {}
+        keys = {}
+        layout = struct.Struct(f"<{self.KEYS.format[1:]}{self.RECORD.size - self.KEYS.size}x")
+        with memoryview(self.map) as view:
+            records = view[self.HEADER.size:self.HEADER.size + self.used * self.RECORD.size]
+            for slot, (flag, game_id, player1, player2, timestamp) in enumerate(layout.iter_unpack(records)):
+                if flag:
+                    game_id = game_id.rstrip(b"\0").decode('ascii')
+                    keys.pop(ids.get(game_id), None)
+                    ids[game_id] = slot
+                    keys[slot] = (player1.rstrip(b"\0").decode('utf-8'), player2.rstrip(b"\0").decode('utf-8'),
+                                  timestamp.rstrip(b"\0").decode('ascii'))
+            records.release()
+        return GameIndex.build(ids, keys)
+
+    def _keys(self, slot):
+        _, game_id, player1, player2, timestamp = self.KEYS.unpack_from(
+            self.map, self.HEADER.size + slot * self.RECORD.size)
+        return (game_id.rstrip(b"\0").decode('ascii'), player1.rstrip(b"\0").decode('utf-8'),
+                player2.rstrip(b"\0").decode('utf-8'), timestamp.rstrip(b"\0").decode('ascii'), slot)
+
+    def _encode(self, game, heap_at=0):
+        # (record, bytes to append to the moves file at heap_at)
+        flag = 1
+        plies = b""
+        if "moves" in game:
+            state = base64.b64decode(game["start"])
+            plies = base64.b64decode(game["moves"])
+            flag = 3
+        elif "state" in game:
+            state = base64.b64decode(game["state"])
+        else:
+            state = GameState.from_saved(game["board"], game["walls"], game["walls_h"], game["walls_v"],
+                                         game["current_player"]).pack()
+        extra = plies
+        if len(state) > self.STATE_BYTES:
+            if len(state) > 0xffff:
+                raise ValueError(f"saved game {game['id']} has too large a board for the archive")
+            extra = state + plies
+            state = self.STATE_LENGTH.pack(len(state))
+            flag |= 4
+        fields = [game["id"].encode('ascii'), game["players"]["player1"].encode('utf-8'),
+                  game["players"]["player2"].encode('utf-8'), game["timestamp"].encode('ascii'),
+                  game.get("duration", "").encode('ascii')]
+        for value, width in zip(fields, (36, 64, 64, 19, 32)):
+            if len(value) > width:
+                raise ValueError(f"saved game {game['id']} does not fit an archive record")
+        moves = len(plies) // 4
+        if moves > 0xffff or heap_at + len(extra) > 0xffffffff:
+            raise ValueError(f"saved game {game['id']} has too many moves for the archive")
+        record = self.RECORD.pack(flag, fields[0], fields[1], fields[2], fields[3], fields[4], len(state), state,
+                                  heap_at if extra else 0, moves)
+        return record, extra
+
+    def _heap_size(self, flag, state, moves):
+        size = 4 * moves if flag & 2 else 0
+        if flag & 4:
+            size += self.STATE_LENGTH.unpack_from(state)[0]
+        return size
+
+    def _read_heap(self, offset, size):
+        self.heap.seek(offset)
+        return self.heap.read(size)
+
+    def _decode(self, slot):
+        flag, game_id, player1, player2, timestamp, duration, length, state, moves_at, moves = self.RECORD.unpack_from(
+            self.map, self.HEADER.size + slot * self.RECORD.size)
+        game = {
+            "id": game_id.rstrip(b"\0").decode('ascii'),
+            "players": {
+                "player1": player1.rstrip(b"\0").decode('utf-8'),
+                "player2": player2.rstrip(b"\0").decode('utf-8')
+            },
+            "timestamp": timestamp.rstrip(b"\0").decode('ascii')
+        }
+        size = self._heap_size(flag, state, moves)
+        extra = self._read_heap(moves_at, size) if size else b""
+        if flag & 4:
+            length = self.STATE_LENGTH.unpack_from(state)[0]
+            state, plies = extra[:length], extra[length:]
+        else:
+            state, plies = state[:length], extra
+        if flag & 2:
+            game["start"] = base64.b64encode(state).decode('ascii')
+            game["moves"] = base64.b64encode(plies).decode('ascii')
+        else:
+            game["state"] = base64.b64encode(state).decode('ascii')
+        duration = duration.rstrip(b"\0")
+        if duration:
+            game["duration"] = duration.decode('ascii')
+        return game
+
+    def _grow(self):
+        self.map.flush()
+        self.map.close()
+        self.capacity *= 2
+        self.file.truncate(self.HEADER.size + self.capacity * self.RECORD.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def __len__(self):
+        return len(self.index.slots)
+
+    def __contains__(self, game_id):
+        return game_id in self.index.ids
+
+    def put(self, game):
+        with self.lock:
+            self.heap.seek(0, os.SEEK_END)
+            record, extra = self._encode(game, self.heap.tell())
+            if extra:
+                self.heap.write(extra)
+                self.heap.flush()
+            if self.used == self.capacity:
+                self._grow()
+            slot = self.used
+            offset = self.HEADER.size + slot * self.RECORD.size
+            self.map[offset:offset + self.RECORD.size] = record
+            self.used += 1
+            self.HEADER.pack_into(self.map, 0, self.MAGIC, self.VERSION, self.RECORD.size, self.used)
+            previous = self.index.ids.get(game["id"])
+            if previous is not None:
+                self._kill(previous)
+            self.index.add(*self._keys(slot))
+
+    def _kill(self, slot):
+        self.index.remove(*self._keys(slot))
+        self.map[self.HEADER.size + slot * self.RECORD.size] = 0
+        self.dead += 1
+
+    def get(self, game_id):
+        with self.lock:
+            slot = self.index.ids.get(game_id)
+            if slot is None:
+                return None
+            return self._decode(slot)
+
+    def delete(self, game_id):
+        with self.lock:
+            slot = self.index.ids.get(game_id)
+            if slot is None:
+                return False
+            self._kill(slot)
+        self.maybe_compact()
+        return True
+
+    def count(self, player):
+        with self.lock:
+            return len(self.index.players.get(player, ()))
+
+    def latest(self, player=None):
+        with self.lock:
+            entries = self.index.times if player is None else self.index.players.get(player)
+            if not entries:
+                return None
+            return self._decode(entries[-1][1])
+
+    def games(self, offset=0, limit=None, player=None):
+        end = None if limit is None else offset + limit
+        while end is None or offset < end:
+            with self.lock:
+                stop = offset + self.PAGE if end is None else min(offset + self.PAGE, end)
+                if player is None:
+                    slots = self.index.slots[offset:stop]
+                else:
+                    slots = [slot for _, slot in self.index.players.get(player, [])[offset:stop]]
+                page = [self._decode(slot) for slot in slots]
+            if not page:
+                return
+            yield from page
+            offset += len(page)
+
+    def maybe_compact(self):
+        if self.dead < self.compact_min or self.dead < len(self.index.slots) * self.compact_ratio:
+            return
+        if self.compactor is not None and self.compactor.is_alive():
+            return
+        self.compactor = threading.Thread(target=self.compact, daemon=True)
+        self.compactor.start()
+
+    def compact(self):
+        with self.lock:
+            size = self.RECORD.size
+            records = []
+            directory = os.path.dirname(os.path.abspath(self.path))
+            open(self.path + ".tmp", 'wb').close()
+            _fsync_path(directory)
+            with open(self.moves_path + ".tmp", 'wb') as heap:
+                for slot in self.index.slots:
+                    start = self.HEADER.size + slot * size
+                    record = bytearray(self.map[start:start + size])
+                    flag, *_, state, moves_at, moves = self.RECORD.unpack_from(record)
+                    extra = self._heap_size(flag, state, moves)
+                    if extra:
+                        self.MOVES.pack_into(record, self.MOVES_AT, heap.tell(), moves)
+                        heap.write(self._read_heap(moves_at, extra))
+                    records.append(record)
+                heap.flush()
+                os.fsync(heap.fileno())
+            self._write(self.path + ".tmp", records)
+            self.map.close()
+            self.file.close()
+            self.heap.close()
+            os.replace(self.path + ".tmp", self.path)
+            _fsync_path(directory)
+            os.replace(self.moves_path + ".tmp", self.moves_path)
+            _fsync_path(directory)
+            self._open()
+
+    def close(self):
+        if self.compactor is not None:
+            self.compactor.join()
+        with self.lock:
+            self.map.flush()
+            self.map.close()
+            self.file.close()
+            self.heap.close()
+            self.index.save(self.index_path, self.used)
+
+
+class Leaderboard:
+    # Wins per player plus a list of (-wins, player) keys kept sorted, so a
+    # result moves one key and pages and ranks are slices and bisects. Each
+    # result appends the player's new totals to <name>.log; the JSON snapshot
+    # is only rewritten every `checkpoint_every` results. Log records hold
+    # totals rather than increments, so replaying them over a newer snapshot
+    # is harmless.
+    def __init__(self, path, checkpoint_every=1024):
+        self.path = path
+        self.log_path = os.path.splitext(path)[0] + ".log"
+        self.checkpoint_every = checkpoint_every
+        self.stats = {player: dict(stats) for player, stats in load_json(path, {}).items()}
+        self.pending = self._replay()
+        self.keys = sorted((-stats.get("wins", 0), player) for player, stats in self.stats.items())
+        self.log = None
+
+    def _replay(self):
+        if not os.path.exists(self.log_path):
+            return 0
+        count = 0
+        offset = 0
+        with open(self.log_path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                self.stats[record["player"]] = record["stats"]
+                count += 1
+                offset += len(line)
+        if offset != os.path.getsize(self.log_path):
+            with open(self.log_path, 'r+b') as file:
+                file.truncate(offset)
+        return count
+
+    def __len__(self):
+        return len(self.keys)
+
+    def record_win(self, player):
+        stats = self.stats.get(player)
+        if stats is None:
+            stats = self.stats[player] = {"wins": 0, "losses": 0}
+        else:
+            del self.keys[bisect_left(self.keys, (-stats.get("wins", 0), player))]
+        stats["wins"] = stats.get("wins", 0) + 1
+        insort(self.keys, (-stats["wins"], player))
+        if self.log is None:
+            self.log = open(self.log_path, 'ab')
+        self.log.write((json.dumps({"player": player, "stats": stats}, separators=(",", ":")) + "\n").encode('utf-8'))
+        self.log.flush()
+        self.pending += 1
+        if self.pending >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        if not self.pending:
+            return
+        _replace(self.path, json.dumps(self.stats, indent=4), sync=True)
+        if self.log is None:
+            self.log = open(self.log_path, 'ab')
+        self.log.truncate(0)
+        os.fsync(self.log.fileno())
+        self.pending = 0
+
+    def rank(self, player):
+        stats = self.stats.get(player)
+        if stats is None:
+            return None
+        return bisect_left(self.keys, (-stats.get("wins", 0), player)) + 1
+
+    def page(self, offset=0, limit=None):
+        end = None if limit is None else offset + limit
+        return [(offset + i + 1, player, self.stats[player]) for i, (_, player) in enumerate(self.keys[offset:end])]
+
+    def close(self):
+        self.checkpoint()
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+class JsonBackend:
+    def __init__(self, users_file, leaderboard_file, saved_games):
+        self.users_file = users_file
+        self.leaderboard_file = leaderboard_file
+        self.board = Leaderboard(leaderboard_file)
+        self.saved_games = saved_games
+
+    def close(self):
+        self.board.close()
+        self.saved_games.close()
+
+    def get_user(self, username):
+        return load_json(self.users_file, {}).get(username)
+
+    def add_user(self, username, user):
+        users = load_json(self.users_file, {})
+        users[username] = user
+        save_json_key(self.users_file, users, username)
+
+    def update_user(self, username, fields):
+        users = load_json(self.users_file, {})
+        users[username].update(fields)
+        save_json_key(self.users_file, users, username)
+
+    def record_win(self, player):
+        self.board.record_win(player)
+
+    def leaderboard(self):
+        return self.board.stats
+
+    def count_players(self):
+        return len(self.board)
+
+    def leaderboard_page(self, offset=0, limit=None):
+        return self.board.page(offset, limit)
+
+    def leaderboard_rank(self, player):
+        return self.board.rank(player)
+
+    def save_game(self, game):
+        self.saved_games.put(game)
+
+    def get_game(self, game_id):
+        return self.saved_games.get(game_id)
+
+    def delete_game(self, game_id):
+        return self.saved_games.delete(game_id)
+
+    def count_games(self, player=None):
+        if player is None:
+            return len(self.saved_games)
+        return self.saved_games.count(player)
+
+    def list_games(self, offset=0, limit=None, player=None):
+        return self.saved_games.games(offset, limit, player)
+
+    def latest_game(self, player=None):
+        return self.saved_games.latest(player)
+
+
+class SqliteBackend:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    id TEXT NOT NULL,
+                    email TEXT,
+                    password TEXT NOT NULL,
+                    games TEXT NOT NULL DEFAULT '[]'
+                );
+                CREATE TABLE IF NOT EXISTS leaderboard (
+                    player TEXT PRIMARY KEY,
+                    wins INTEGER NOT NULL DEFAULT 0,
+                    losses INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS saved_games (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    player1 TEXT NOT NULL,
+                    player2 TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS saved_games_player1 ON saved_games (player1, timestamp);
+                CREATE INDEX IF NOT EXISTS saved_games_player2 ON saved_games (player2, timestamp);
+                CREATE INDEX IF NOT EXISTS saved_games_timestamp ON saved_games (timestamp, seq);
+                CREATE INDEX IF NOT EXISTS leaderboard_wins ON leaderboard (wins DESC, player);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    def close(self):
+        self.db.close()
+
+    def is_migrated(self):
+        return self.db.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is not None
+
+    def migrate_from_json(self, users_file, leaderboard_file, saved_games):
+        if self.is_migrated():
+            return False
+        with self.db:
+            for username, user in load_json(users_file, {}).items():
+                self.db.execute(
+                    "INSERT OR IGNORE INTO users (username, id, email, password, games) VALUES (?, ?, ?, ?, ?)",
+                    (username, user["id"], user.get("email"), user["password"], json.dumps(user.get("games", [])))
+                )
+            for player, stats in Leaderboard(leaderboard_file).stats.items():
+                self.db.execute(
+                    "INSERT OR IGNORE INTO leaderboard (player, wins, losses) VALUES (?, ?, ?)",
+                    (player, stats.get("wins", 0), stats.get("losses", 0))
+                )
+            for game in saved_games.games():
+                self._insert_game(game)
+            self.db.execute("INSERT INTO meta (key, value) VALUES ('migrated', '1')")
+        return True
+
+    def get_user(self, username):
+        row = self.db.execute(
+            "SELECT id, email, password, games FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "email": row[1], "password": row[2], "games": json.loads(row[3])}
+
+    def add_user(self, username, user):
+        with self.db:
+            self.db.execute(
+                "INSERT INTO users (username, id, email, password, games) VALUES (?, ?, ?, ?, ?)",
+                (username, user["id"], user["email"], user["password"], json.dumps(user["games"]))
+            )
+
+    def update_user(self, username, fields):
+        unknown = set(fields) - {"email", "password", "games"}
+        if unknown:
+            raise ValueError(f"cannot update user fields: {', '.join(sorted(unknown))}")
+        values = [json.dumps(value) if key == "games" else value for key, value in fields.items()]
+        with self.db:
+            self.db.execute(
+                f"UPDATE users SET {', '.join(f'{key} = ?' for key in fields)} WHERE username = ?",
+                (*values, username)
+            )
+
+    def record_win(self, player):
+        with self.db:
+            self.db.execute(
+                "INSERT INTO leaderboard (player, wins) VALUES (?, 1) "
+                "ON CONFLICT(player) DO UPDATE SET wins = wins + 1",
+                (player,)
+            )
+
+    def leaderboard(self):
+        return {
+            player: {"wins": wins, "losses": losses}
+            for player, wins, losses in self.db.execute("SELECT player, wins, losses FROM leaderboard")
+        }
+
+    def count_players(self):
+        return self.db.execute("SELECT COUNT(*) FROM leaderboard").fetchone()[0]
+
+    def leaderboard_page(self, offset=0, limit=None):
+        rows = self.db.execute(
+            "SELECT player, wins, losses FROM leaderboard ORDER BY wins DESC, player LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset)
+        )
+        return [(offset + i + 1, player, {"wins": wins, "losses": losses})
+                for i, (player, wins, losses) in enumerate(rows)]
+
+    def leaderboard_rank(self, player):
+        row = self.db.execute("SELECT wins FROM leaderboard WHERE player = ?", (player,)).fetchone()
+        if row is None:
+            return None
+        return self.db.execute(
+            "SELECT COUNT(*) + 1 FROM leaderboard WHERE wins > ? OR (wins = ? AND player < ?)",
+            (row[0], row[0], player)
+        ).fetchone()[0]
+
+    def _insert_game(self, game):
+        self.db.execute(
+            "INSERT OR REPLACE INTO saved_games (id, player1, player2, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+            (game["id"], game["players"]["player1"], game["players"]["player2"], game["timestamp"],
+             json.dumps(game))
+        )
+
+    def save_game(self, game):
+        with self.db:
+            self._insert_game(game)
+
+    def get_game(self, game_id):
+        row = self.db.execute("SELECT data FROM saved_games WHERE id = ?", (game_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_game(self, game_id):
+        with self.db:
+            return self.db.execute("DELETE FROM saved_games WHERE id = ?", (game_id,)).rowcount > 0
+
+    def count_games(self, player=None):
+        if player is None:
+            return self.db.execute("SELECT COUNT(*) FROM saved_games").fetchone()[0]
+        return self.db.execute(
+            "SELECT COUNT(*) FROM saved_games WHERE player1 = ? OR player2 = ?", (player, player)
+        ).fetchone()[0]
+
+    def list_games(self, offset=0, limit=None, player=None):
+        limit = -1 if limit is None else limit
+        if player is None:
+            rows = self.db.execute("SELECT data FROM saved_games ORDER BY seq LIMIT ? OFFSET ?", (limit, offset))
+        else:
+            rows = self.db.execute(
+                "SELECT data FROM saved_games WHERE player1 = ? OR player2 = ? "
+                "ORDER BY timestamp, seq LIMIT ? OFFSET ?",
+                (player, player, limit, offset)
+            )
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def latest_game(self, player=None):
+        if player is None:
+            row = self.db.execute("SELECT data FROM saved_games ORDER BY timestamp DESC, seq DESC LIMIT 1").fetchone()
+        else:
+            row = self.db.execute(
+                "SELECT data FROM saved_games WHERE player1 = ? OR player2 = ? "
+                "ORDER BY timestamp DESC, seq DESC LIMIT 1",
+                (player, player)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
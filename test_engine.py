@@ -0,0 +1,50 @@
+import random
+from engine import GameState, PathOracle, WALL_OK, legal_walls
+
+
+def brute_force_walls(state):
+    size = state.size
+    return {(row, col, orientation)
+            for row in range(size - 1) for col in range(size - 1) for orientation in ("h", "v")
+            if state.wall_status(row, col, orientation) == WALL_OK
+            and not state.blocks_path(row, col, orientation)}
+
+
+def random_states(seed, count=60):
+    # random play through pawn_moves, which includes the diagonal jump past
+    # a wall, so some positions leave a pawn cut off from its goal
+    rnd = random.Random(seed)
+    for _ in range(count):
+        size = rnd.randint(3, 9)
+        state = GameState(size, walls=size + 1)
+        for _ in range(rnd.randint(0, 4 * size)):
+            if state.winner() is not None:
+                break
+            walls = [(row, col, orientation)
+                     for row in range(size - 1) for col in range(size - 1) for orientation in ("h", "v")
+                     if state.wall_status(row, col, orientation) == WALL_OK]
+            targets = state.pawn_moves()
+            if walls and (rnd.random() < 0.5 or not targets):
+                state.make_wall(*rnd.choice(walls))
+            elif targets:
+                state.make_move(rnd.choice(targets))
+            else:
+                break
+            yield state.copy()
+
+
+def test_legal_walls_matches_brute_force():
+    cut_off = 0
+    for state in random_states(1):
+        expected = brute_force_walls(state)
+        assert set(legal_walls(state)) == expected
+        assert set(legal_walls(state, PathOracle(state))) == expected
+        if not state.has_path(0) or not state.has_path(1):
+            cut_off += 1
+            assert legal_walls(state) == []
+    assert cut_off > 0
+
+
+def test_legal_walls_without_walls_left():
+    state = GameState(5, walls=0)
+    assert legal_walls(state) == []
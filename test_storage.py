@@ -0,0 +1,170 @@
+import os
+import base64
+import random
+import json
+import pytest
+import storage
+from engine import GameState
+from storage import SavedGameArchive, load_json, save_json, save_json_key, checkpoint, recover_journal
+
+
+class Crash(Exception):
+    pass
+
+
+def make_games(count):
+    rng = random.Random(7)
+    games = []
+    for n in range(count):
+        start = GameState(19 if n % 5 == 0 else 9).pack()
+        plies = rng.randbytes(4 * rng.randrange(1, 40))
+        games.append({
+            "id": f"game-{n:04d}",
+            "players": {"player1": f"p{n % 3}", "player2": f"q{n % 4}"},
+            "timestamp": f"2024-01-01 00:{n // 60:02d}:{n % 60:02d}",
+            "start": base64.b64encode(start).decode('ascii'),
+            "moves": base64.b64encode(plies).decode('ascii')
+        })
+    return games
+
+
+def crash_on(monkeypatch, owner, name, call):
+    original = getattr(owner, name)
+    calls = [0]
+
+    def wrapper(*args, **kwargs):
+        calls[0] += 1
+        if calls[0] == call:
+            raise Crash(name)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, wrapper)
+
+
+# every step of SavedGameArchive.compact: copying the moves, writing the new
+# archive, the two renames and reopening
+@pytest.mark.parametrize("owner, name, call", [
+    (SavedGameArchive, "_read_heap", 3),
+    (SavedGameArchive, "_write", 1),
+    (os, "replace", 1),
+    (os, "replace", 2),
+    (SavedGameArchive, "_open", 1),
+])
+def test_compaction_survives_a_crash(tmp_path, monkeypatch, owner, name, call):
+    path = str(tmp_path / "saved_games.dat")
+    archive = SavedGameArchive(path)
+    games = make_games(20)
+    for game in games:
+        archive.put(game)
+    for game in games[::2]:
+        archive.delete(game["id"])
+    crash_on(monkeypatch, owner, name, call)
+    with pytest.raises(Crash):
+        archive.compact()
+    monkeypatch.undo()
+
+    reopened = SavedGameArchive(path)
+    assert len(reopened) == 10
+    for game in games[1::2]:
+        assert reopened.get(game["id"]) == game
+    for game in games[::2]:
+        assert reopened.get(game["id"]) is None
+    reopened.compact()
+    for game in games[1::2]:
+        assert reopened.get(game["id"]) == game
+    reopened.close()
+    assert not os.path.exists(path + ".tmp")
+    assert not os.path.exists(path + ".moves.tmp")
+
+
+def test_compaction_drops_resumed_games(tmp_path):
+    path = str(tmp_path / "saved_games.dat")
+    archive = SavedGameArchive(path)
+    games = make_games(20)
+    for game in games:
+        archive.put(game)
+    for game in games[::2]:
+        archive.delete(game["id"])
+    size = os.path.getsize(path + ".moves")
+    archive.compact()
+    assert os.path.getsize(path + ".moves") < size
+    archive.close()
+    reopened = SavedGameArchive(path)
+    assert [game["id"] for game in reopened.games()] == [game["id"] for game in games[1::2]]
+    reopened.close()
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name, value in (("_store_lock", None), ("_journal", None), ("_dirty", {}), ("_unsynced", set())):
+        monkeypatch.setattr(storage, name, value)
+    yield tmp_path
+    if storage._journal is not None:
+        storage._journal.close()
+    if storage._store_lock is not None:
+        storage._store_lock.close()
+
+
+def read(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def test_keyed_writes_wait_for_the_checkpoint(journal):
+    users = load_json("users.json", {})
+    save_json("users.json", users)
+    for name in ("alice", "bob"):
+        users[name] = {"password": name}
+        save_json_key("users.json", users, name)
+    assert read("users.json") == {}
+    assert load_json("users.json", {}) == {"alice": {"password": "alice"}, "bob": {"password": "bob"}}
+    checkpoint()
+    assert read("users.json") == users
+    assert not os.path.exists(storage.JOURNAL_FILE)
+
+
+def test_recovery_replays_keyed_writes(journal):
+    users = load_json("users.json", {})
+    users["alice"] = {"password": "a"}
+    save_json("users.json", users)
+    users["bob"] = {"password": "b"}
+    save_json_key("users.json", users, "bob")
+    users["alice"]["password"] = "c"
+    save_json_key("users.json", users, "alice")
+    # a crash: the files and the journal stay, the process state is lost
+    storage._journal.close()
+    storage._journal = None
+    storage._dirty.clear()
+    storage._cache.clear()
+    assert read("users.json") == {"alice": {"password": "a"}}
+    recover_journal()
+    assert read("users.json") == {"alice": {"password": "c"}, "bob": {"password": "b"}}
+    assert not os.path.exists(storage.JOURNAL_FILE)
+
+
+def test_migrates_the_old_log(tmp_path):
+    games = make_games(6)
+    log_path = str(tmp_path / "saved_games.log")
+    records = [{"op": "put", "game": game} for game in games]
+    records += [{"op": "del", "id": games[1]["id"]}, {"op": "put", "game": dict(games[2], timestamp="2024-02-02 00:00:00")}]
+    with open(log_path, 'w') as file:
+        file.writelines(json.dumps(record) + "\n" for record in records)
+        file.write(json.dumps({"op": "del", "id": games[3]["id"]}))
+    archive = SavedGameArchive(str(tmp_path / "saved_games.dat"), log_path)
+    assert [game["id"] for game in archive.games()] == [games[n]["id"] for n in (0, 2, 3, 4, 5)]
+    assert archive.get(games[2]["id"])["timestamp"] == "2024-02-02 00:00:00"
+    assert archive.get(games[4]["id"]) == games[4]
+    archive.close()
+    assert not os.path.exists(log_path) and os.path.exists(log_path + ".migrated")
+
+
+def test_migrates_the_legacy_list(tmp_path):
+    games = make_games(3)
+    legacy_path = str(tmp_path / "saved_games.json")
+    with open(legacy_path, 'w') as file:
+        json.dump(games, file)
+    archive = SavedGameArchive(str(tmp_path / "saved_games.dat"), str(tmp_path / "saved_games.log"), legacy_path)
+    assert list(archive.games()) == games
+    archive.close()
+    assert os.path.exists(legacy_path + ".migrated")